@@ -1,16 +1,40 @@
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from chromadb.utils import embedding_functions
-from PyPDF2 import PdfReader
-from anthropic import Anthropic
+from __future__ import annotations
+
+import asyncio
+import functools
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import glob
 import json
-from typing import List, Dict, Optional, Union
+from typing import TYPE_CHECKING, Callable, Iterator, List, Dict, Optional, Tuple, Union
 from dotenv import load_dotenv
 
+from bm25_index import load_bm25_index, reciprocal_rank_fusion
+from chunking import PageChunker
+from context_builder import ContextAssembler, SessionMemory, extractive_summary
+from corpus_manifest import chunk_ids, load_manifest
+from ingestion import IngestionCancelled, IngestionPipeline
+from instrumentation import get_instrumentation, traced
+from language import detect_language
+from llm_client import DEFAULT_HEDGE_WORKERS, LLMClient, LLMUnavailableError, get_rate_limiter
+from memo import LRUCache, shared_memo
+from page_cache import load_page_cache
+from prompts import (AI_PROMPT, HUMAN_PROMPT, build_quiz_prompt, build_response_prompt,
+                     static_prefix)
+from quiz_bank import SYLLABUS_FILENAME, load_quiz_bank, syllabus_topics
+from reranker import get_reranker
+from response_cache import load_response_cache
+from tokens import estimate_tokens
+from vector_store import get_quantized_store
+from resources import (DEFAULT_EMBEDDING_MODEL, embedding_collection_name, get_chroma_client,
+                       get_embedding_function, get_executor, get_stage_semaphore)
+
+# chromadb is only needed for type hints here; the client is created on first use
+if TYPE_CHECKING:
+    import chromadb
+
 # Load environment variables
 load_dotenv()
 
@@ -19,28 +43,150 @@ class EconomicsTutor:
     
     def __init__(self, persist_directory: str = "chromadb_data", 
                  collection_name: str = "initial_corpus",
-                 corpus_dir: str = "initial_corpus"):
-        """Initialize the tutor with necessary configurations and clients."""
+                 corpus_dir: str = "initial_corpus",
+                 chunk_size: int = 1000,
+                 chunk_overlap: int = 100,
+                 ingest_workers: Optional[int] = None,
+                 embed_batch_size: int = 64,
+                 stage_limits: Optional[Dict[str, int]] = None,
+                 response_cache: bool = True,
+                 cache_similarity_threshold: float = 0.92,
+                 hybrid_retrieval: bool = True,
+                 retrieval_candidates: int = 10,
+                 lexical_prefilter: bool = False,
+                 quantization: Optional[str] = None,
+                 reranker: Optional[str] = None,
+                 rerank_candidates: int = 20,
+                 rerank_min_score: float = 0.3,
+                 context_tokens: int = 1500,
+                 history_tokens: int = 500,
+                 memory_summarizer: str = "extractive",
+                 quiz_bank: bool = True,
+                 quiz_bank_depth: int = 2,
+                 quiz_attempts: int = 3,
+                 requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None,
+                 hedge_after: Optional[float] = None,
+                 hedge_workers: int = DEFAULT_HEDGE_WORKERS,
+                 embedding_model: Optional[str] = None,
+                 language_routing: bool = True,
+                 anthropic_client=None,
+                 async_anthropic_client=None,
+                 llm_client: Optional[LLMClient] = None,
+                 embedding_function=None,
+                 instrumentation=None):
+        """Initialize the tutor with necessary configurations and clients.
+        
+        The Anthropic clients and the embedding function default to the
+        process-wide shared ones; passing them in is meant for benchmarks and
+        offline runs with stand-in implementations.
+        
+        LLM calls go through an LLMClient, which retries transient failures,
+        hedges slow interactive calls after `hedge_after` seconds when set,
+        with at most `hedge_workers` hedges in flight, and keeps within
+        `requests_per_minute` and `tokens_per_minute` using limits shared by
+        every tutor of the process.
+        
+        `embedding_model` replaces the default English MiniLM, e.g. with
+        resources.MULTILINGUAL_EMBEDDING_MODEL so English questions find the
+        French course material. Each other model has its own collection,
+        with its manifest, lexical index, response cache and quiz bank in a
+        subdirectory of the persist directory named after it. With
+        `language_routing`, a question only searches the chunks in its
+        language when there are enough of them, and every language otherwise.
+        """
+        if embedding_function is None:
+            self.EMBEDDING_MODEL = embedding_model or DEFAULT_EMBEDDING_MODEL
+            self.hf_embed = get_embedding_function(self.EMBEDDING_MODEL)
+        else:
+            self.EMBEDDING_MODEL = getattr(embedding_function, "model_name",
+                                           type(embedding_function).__name__)
+            self.hf_embed = embedding_function
         self.PERSIST_DIRECTORY = persist_directory
-        self.COLLECTION_NAME = collection_name
+        self.COLLECTION_NAME = embedding_collection_name(collection_name, embedding_model) \
+            if embedding_model else collection_name
+        # Manifest, response cache and quiz bank of the collection; the default
+        # model's stay at the top of the persist directory, as they always were
+        self.STATE_DIRECTORY = persist_directory if self.COLLECTION_NAME == collection_name \
+            else os.path.join(persist_directory, self.COLLECTION_NAME)
         self.INITIAL_CORPUS_DIR = corpus_dir
+        self.CHUNK_SIZE = chunk_size
+        self.CHUNK_OVERLAP = chunk_overlap
+        self.EMBED_BATCH_SIZE = embed_batch_size
+        self.INGEST_WORKERS = ingest_workers
+        # Hybrid retrieval fuses this many dense and lexical candidates per query
+        self.HYBRID_RETRIEVAL = hybrid_retrieval
+        self.RETRIEVAL_CANDIDATES = retrieval_candidates
+        self.LEXICAL_PREFILTER = lexical_prefilter
+        self.LANGUAGE_ROUTING = language_routing
+        # Dense search runs on a memory-mapped "int8" or "float16" export of the
+        # collection when set, and on the collection itself otherwise
+        self.QUANTIZATION = quantization
+        # Cross-encoder model rescoring `rerank_candidates` retrieved chunks per
+        # question, keeping those scoring at least `rerank_min_score`; off when None
+        self.RERANK_MODEL = reranker
+        self.RERANK_CANDIDATES = rerank_candidates
+        self.RERANK_MIN_SCORE = rerank_min_score
+        self.reranker = get_reranker(reranker) if reranker else None
+        # Token budgets for retrieved context and conversation history in prompts
+        self.HISTORY_TOKENS = history_tokens
+        # How conversation turns that no longer fit verbatim are summarized:
+        # "extractive" (first sentence of each) or "llm" (folded in by Claude)
+        self.MEMORY_SUMMARIZER = memory_summarizer
+        self._memories = LRUCache(maxsize=1024)
+        self.context_assembler = ContextAssembler(max_tokens=context_tokens)
+        # Completions tried before giving up on a quiz that fails validation
+        self.QUIZ_ATTEMPTS = quiz_attempts
+        # Maximum number of in-flight operations per stage for the async API
+        self.STAGE_LIMITS = {"retrieval": 8, "llm": 256, "ingest": 1}
+        self.STAGE_LIMITS.update(stage_limits or {})
+        # Stage timers and counters; the process-wide default is disabled until
+        # an exporter is registered
+        self.instrumentation = instrumentation or get_instrumentation()
         
-        # Initialize Anthropic client
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY environment variable not found")
-        self.anthropic = Anthropic(api_key=api_key)
-        
-        # Initialize ChromaDB
-        self.chroma_client = chromadb.Client(Settings(
-            persist_directory=self.PERSIST_DIRECTORY
-        ))
-        self.hf_embed = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        # Clients and the embedding model are shared by every tutor in the process,
+        # so a new session only costs a few attribute assignments. They are
+        # created, and the model loaded, on first use (see warm_up)
+        self.llm = llm_client or LLMClient(
+            client=anthropic_client,
+            async_client=async_anthropic_client,
+            limiter=get_rate_limiter(requests_per_minute, tokens_per_minute),
+            hedge_after=hedge_after,
+            hedge_workers=hedge_workers,
+            instrumentation=self.instrumentation
         )
+        self._chroma_client = None
+        
+        # Collection handle and process-wide memos of query embeddings and
+        # retrieval results; results are keyed by corpus version
+        self._collection: Optional[chromadb.Collection] = None
+        self._embedding_memo = shared_memo("query_embeddings", maxsize=4096)
+        self._retrieval_memo = shared_memo("retrieval_results", maxsize=1024)
         
         # Ensure corpus directory exists
         os.makedirs(self.INITIAL_CORPUS_DIR, exist_ok=True)
+        
+        # Record of the files indexed in the collection, shared by every tutor using it
+        self.manifest = load_manifest(self.STATE_DIRECTORY)
+        # Extracted page text by file hash, so re-chunking or embedding with
+        # another model never parses PDFs again
+        self.page_cache = load_page_cache(self.PERSIST_DIRECTORY)
+        # Statistics of the last initialize_corpus run
+        self.last_ingestion_stats: Optional[Dict] = None
+        
+        # BM25 index over the same chunks as the collection, kept in sync on ingestion
+        self.lexical_index = load_bm25_index(self.STATE_DIRECTORY, self.COLLECTION_NAME)
+        
+        # Answers to similar questions, invalidated whenever the corpus changes
+        self.response_cache = load_response_cache(
+            self.STATE_DIRECTORY,
+            similarity_threshold=cache_similarity_threshold
+        ) if response_cache else None
+        
+        # Quizzes generated ahead of time, also invalidated when the corpus changes
+        self.quiz_bank = load_quiz_bank(
+            self.STATE_DIRECTORY, depth=quiz_bank_depth
+        ) if quiz_bank else None
 
         # Teaching patterns and instructions by language
         self.instructions = {
@@ -68,8 +214,51 @@ class EconomicsTutor:
             }
         }
         
+    @property
+    def anthropic(self):
+        """Anthropic client, the shared one unless another was passed in."""
+        return self.llm.client
+
+    @property
+    def chroma_client(self):
+        """Shared Chroma client of the persist directory."""
+        if self._chroma_client is None:
+            self._chroma_client = get_chroma_client(self.PERSIST_DIRECTORY)
+        return self._chroma_client
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """Create the clients and load the embedding model ahead of the first question.
+        
+        Args:
+            background: Run in a daemon thread and return it, instead of blocking
+        """
+        def run():
+            started = time.perf_counter()
+            try:
+                self.chroma_client
+                self.hf_embed(["warm-up"])
+                if self.reranker is not None:
+                    self.reranker.load()
+                self.anthropic
+            except Exception as e:
+                print(f"Warm-up failed: {str(e)}")
+                return
+            print(f"Warm-up done in {time.perf_counter() - started:.2f}s")
+        
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="tutor-warm-up", daemon=True)
+        thread.start()
+        return thread
+
     def initialize_corpus(self):
-        """Initialize or get the document collection."""
+        """Initialize the document collection and index new or changed PDFs.
+        
+        Files are tracked in the corpus manifest, so a reload only embeds new or
+        modified PDFs and removes the chunks of files deleted from the corpus
+        directory.
+        """
         try:
             collection = self.chroma_client.get_collection(
                 name=self.COLLECTION_NAME,
@@ -83,150 +272,708 @@ class EconomicsTutor:
             )
             print("Created new collection")
             
-            pdf_files = glob.glob(os.path.join(self.INITIAL_CORPUS_DIR, "*.pdf"))
-            if pdf_files:
-                print(f"Found {len(pdf_files)} PDF files in {self.INITIAL_CORPUS_DIR}")
-                for pdf_path in pdf_files:
-                    self.add_document_to_corpus(pdf_path, collection)
-                    print(f"Added {pdf_path} to corpus")
-            else:
-                print(f"No PDF files found in {self.INITIAL_CORPUS_DIR}.")
-        
+        pdf_files = glob.glob(os.path.join(self.INITIAL_CORPUS_DIR, "*.pdf"))
+        if pdf_files:
+            print(f"Found {len(pdf_files)} PDF files in {self.INITIAL_CORPUS_DIR}")
+        else:
+            print(f"No PDF files found in {self.INITIAL_CORPUS_DIR}.")
+        self.last_ingestion_stats = self._sync_documents(collection, pdf_files, prune=True)
+        self._collection = collection
         return collection
     
     def add_document_to_corpus(self, pdf_path: str, 
-                             collection: Optional[chromadb.Collection] = None) -> chromadb.Collection:
-        """Add a new PDF document to the corpus."""
+                             collection: Optional[chromadb.Collection] = None,
+                             progress: Optional[Callable[[Dict], None]] = None,
+                             cancel: Optional[threading.Event] = None) -> chromadb.Collection:
+        """Add a new PDF document to the corpus, skipping it if already indexed.
+        
+        `progress` and `cancel` are handed to IngestionPipeline.run; a cancelled
+        upload leaves no chunks behind and raises IngestionCancelled.
+        """
         if collection is None:
             collection = self.get_persistent_collection()
         
-        reader = PdfReader(pdf_path)
-        text = ""
+        self._sync_documents(collection, [pdf_path], prune=False, progress=progress, cancel=cancel)
         
-        for page in reader.pages:
-            text += page.extract_text()
+        return collection
+
+    def _sync_documents(self, collection: chromadb.Collection, pdf_paths: List[str],
+                        prune: bool, progress: Optional[Callable[[Dict], None]] = None,
+                        cancel: Optional[threading.Event] = None) -> Dict:
+        """Bring the collection in line with the given files using the manifest.
         
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, 
-            chunk_overlap=100
-        )
-        chunks = text_splitter.split_text(text)
+        Args:
+            collection: Collection to update
+            pdf_paths: Files that should be indexed
+            prune: Whether to drop indexed files of the corpus directory that
+                are no longer in `pdf_paths`
+            progress: Called with the running ingestion statistics
+            cancel: Event that stops the ingestion when set
+            
+        Returns:
+            Ingestion statistics for the files that were (re)indexed
+        """
+        with self.manifest.lock:
+            if collection.count() == 0 and self.manifest.entries:
+                # The vector store was reset underneath the manifest
+                self.manifest.clear()
+                self.lexical_index.clear()
+            elif len(self.lexical_index) == 0 and collection.count() > 0:
+                self._rebuild_lexical_index(collection)
+            
+            chunking = PageChunker(self.CHUNK_SIZE, self.CHUNK_OVERLAP).params
+            if self.manifest.chunking != chunking:
+                pdf_paths = self._drop_for_rechunking(collection, pdf_paths)
+                self.manifest.set_chunking(chunking)
+            
+            to_index, stale, unchanged = self.manifest.plan(
+                pdf_paths,
+                prune_directory=self.INITIAL_CORPUS_DIR if prune else None
+            )
+            
+            for key in stale:
+                entry = self.manifest.remove(key)
+                if not self.manifest.is_hash_indexed(entry["hash"]):
+                    stale_ids = chunk_ids(entry["hash"], entry["chunks"])
+                    collection.delete(ids=stale_ids)
+                    self.lexical_index.remove(stale_ids)
+                    self.page_cache.discard(entry["hash"])
+                    print(f"Removed {entry['chunks']} chunks of {key}")
+            
+            # Identical content already indexed under another name needs no embedding
+            for pdf_path, file_hash in list(to_index.items()):
+                duplicate = next((entry for entry in self.manifest.entries.values()
+                                  if entry["hash"] == file_hash), None)
+                if duplicate is not None:
+                    self.manifest.record(pdf_path, file_hash, duplicate["chunks"])
+                    del to_index[pdf_path]
+            
+            try:
+                stats = self._ingestion_pipeline(collection).run(
+                    to_index.keys(), to_index, progress=progress, cancel=cancel
+                )
+            except IngestionCancelled:
+                self.manifest.save()
+                self.lexical_index.save()
+                raise
+            for pdf_path, n_chunks in stats["chunks_by_file"].items():
+                self.manifest.record(pdf_path, to_index[pdf_path], n_chunks)
+            self.manifest.save()
+            self.lexical_index.save()
+            if self.QUANTIZATION is not None:
+                self._dense_index(collection)
         
-        start_id = collection.count()
+        print(f"Indexed {stats['files']} new or changed files ({stats['chunks']} chunks), "
+              f"{len(unchanged)} unchanged, {len(stale)} removed or replaced")
+        return stats
+
+    def _drop_for_rechunking(self, collection: chromadb.Collection,
+                             pdf_paths: List[str]) -> List[str]:
+        """Remove every indexed file's chunks so they are split again with the current settings.
         
-        collection.add(
-            documents=chunks,
-            metadatas=[{"source": os.path.basename(pdf_path), "page": i} 
-                      for i in range(len(chunks))],
-            ids=[f"doc_{start_id + i}" for i in range(len(chunks))]
+        Returns the files to sync, extended with indexed files that still
+        exist; their text comes from the page cache.
+        """
+        if self.manifest.entries:
+            print(f"Chunking settings changed, re-chunking {len(self.manifest.entries)} files")
+        pdf_paths = list(pdf_paths)
+        requested = {self.manifest.key(path) for path in pdf_paths}
+        for key, entry in list(self.manifest.entries.items()):
+            ids = chunk_ids(entry["hash"], entry["chunks"])
+            collection.delete(ids=ids)
+            self.lexical_index.remove(ids)
+            self.manifest.remove(key)
+            if key not in requested and os.path.exists(key):
+                pdf_paths.append(key)
+        return pdf_paths
+
+    def _ingestion_pipeline(self, collection: chromadb.Collection) -> IngestionPipeline:
+        """Build the staged ingestion pipeline writing into the given collection."""
+        return IngestionPipeline(
+            collection,
+            chunk_size=self.CHUNK_SIZE,
+            chunk_overlap=self.CHUNK_OVERLAP,
+            batch_size=self.EMBED_BATCH_SIZE,
+            max_workers=self.INGEST_WORKERS,
+            lexical_index=self.lexical_index,
+            page_cache=self.page_cache
         )
-        
-        return collection
 
+    def _rebuild_lexical_index(self, collection: chromadb.Collection,
+                               batch_size: int = 1000) -> None:
+        """Fill the BM25 index from the chunks already stored in the collection."""
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            batch = collection.get(include=["documents", "metadatas"],
+                                   limit=batch_size, offset=offset)
+            self.lexical_index.add(batch["ids"], batch["documents"], batch["metadatas"])
+        self.lexical_index.save()
+        print(f"Rebuilt lexical index with {len(self.lexical_index)} chunks")
+
+    @traced("collection")
     def get_persistent_collection(self) -> chromadb.Collection:
-        """Get or create the persistent collection."""
+        """Get or create the persistent collection, reusing the cached handle."""
+        if self._collection is not None:
+            return self._collection
         try:
-            return self.chroma_client.get_collection(
+            self._collection = self.chroma_client.get_collection(
                 name=self.COLLECTION_NAME,
                 embedding_function=self.hf_embed
             )
         except ValueError:
-            return self.initialize_corpus()
-
-    def query_documents(self, query: str, n_results: int = 3) -> Dict:
-        """Query the collection for relevant documents."""
-        collection = self.get_persistent_collection()
-        return collection.query(
-            query_texts=[query],
-            n_results=n_results
+            self._collection = self.initialize_corpus()
+        return self._collection
+
+    @traced("retrieve")
+    def query_documents(self, query: str, n_results: int = 3,
+                        query_embedding: Optional[List[float]] = None,
+                        rerank: bool = True, language: Optional[str] = None) -> Dict:
+        """Query the collection for relevant documents.
+        
+        With hybrid retrieval, dense (embedding) and lexical (BM25) candidates
+        are fused by reciprocal rank, so exact terms such as PIB, BCE or IS-LM
+        are found even when the embedding misses them. The result has the same
+        shape as a Chroma query result.
+        
+        Results are memoized per corpus version, and query embeddings per
+        query text, so repeated and overlapping queries (e.g. a quiz on the
+        topic just discussed) skip both the embedding model and the search.
+        A precomputed `query_embedding` skips embedding the query again.
+        
+        With a reranker, `rerank_candidates` chunks are retrieved and rescored,
+        and only the (at most `n_results`) chunks above the relevance cutoff are
+        returned, possibly none. `rerank=False` skips that stage.
+        
+        With language routing, only the chunks in the query's language are
+        searched (see _route); `language`, the answer language, stands in
+        when the query is too short to tell.
+        """
+        rerank = rerank and self.reranker is not None
+        n_candidates = max(n_results, self.RERANK_CANDIDATES) if rerank else n_results
+        partition = self._route(query, language, n_candidates)
+        key = self._retrieval_key(query, n_results, rerank, partition)
+        results = self._retrieval_memo.get(key)
+        if results is not None:
+            return results
+        
+        if query_embedding is None:
+            query_embedding = self._embed_query(query)
+        collection = self._dense_index()
+        
+        if not self._use_hybrid():
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_candidates,
+                where={"language": partition} if partition else None
+            )
+        else:
+            results = self._hybrid_query(collection, query, query_embedding, n_candidates,
+                                         partition)
+        if rerank:
+            with self.instrumentation.span("rerank", candidates=len(results["ids"][0])):
+                results = self.reranker.rerank(query, results, n_results, self.RERANK_MIN_SCORE,
+                                               self.instrumentation)
+        self._retrieval_memo.put(key, results)
+        self.instrumentation.incr("chunks_retrieved", len(results["ids"][0]))
+        return results
+
+    @traced("retrieve_batch")
+    def query_documents_batch(self, queries: List[str], n_results: int = 3,
+                              query_embeddings: Optional[List[List[float]]] = None,
+                              rerank: bool = True, language: Optional[str] = None) -> List[Dict]:
+        """Query the collection for many queries with one vector search per language partition.
+        
+        Same results and memoization as query_documents, except that the
+        lexical prefilter is not applied since the dense search is shared.
+        The candidates of every query are reranked in shared batches.
+        """
+        rerank = rerank and self.reranker is not None
+        n_candidates = max(n_results, self.RERANK_CANDIDATES) if rerank else n_results
+        partitions = [self._route(query, language, n_candidates) for query in queries]
+        keys = [self._retrieval_key(query, n_results, rerank, partition, prefilter=False)
+                for query, partition in zip(queries, partitions)]
+        results: List[Optional[Dict]] = [self._retrieval_memo.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        
+        if query_embeddings is None:
+            query_embeddings = self._embed_queries(queries)
+        hybrid = self._use_hybrid()
+        index = self._dense_index()
+        candidates: Dict[int, Dict] = {}
+        for partition in dict.fromkeys(partitions[i] for i in missing):
+            group = [i for i in missing if partitions[i] == partition]
+            dense = index.query(
+                query_embeddings=[query_embeddings[i] for i in group],
+                n_results=max(n_candidates, self.RETRIEVAL_CANDIDATES) if hybrid else n_candidates,
+                where={"language": partition} if partition else None
+            )
+            for row, i in enumerate(group):
+                single = {field: [dense[field][row]]
+                          for field in ("ids", "documents", "metadatas", "distances")}
+                if hybrid:
+                    single = self._fuse_lexical(queries[i], single, n_candidates,
+                                                partition=partition)
+                candidates[i] = single
+        
+        reranked = [candidates[i] for i in missing]
+        if rerank:
+            with self.instrumentation.span("rerank", candidates=sum(len(c["ids"][0])
+                                                                    for c in reranked)):
+                reranked = self.reranker.rerank_batch(
+                    [queries[i] for i in missing], reranked, n_results,
+                    self.RERANK_MIN_SCORE, self.instrumentation
+                )
+        
+        for i, single in zip(missing, reranked):
+            results[i] = single
+            self._retrieval_memo.put(keys[i], single)
+            self.instrumentation.incr("chunks_retrieved", len(single["ids"][0]))
+        return results
+
+    def _route(self, query: str, language: Optional[str], n_candidates: int) -> Optional[str]:
+        """Language partition a query searches, or None to search every language.
+        
+        The query's own language decides, then the answer language. A
+        partition holding fewer than the candidates wanted (e.g. English
+        questions on the French corpus) is passed over for a cross-language
+        search, which only ranks well with a multilingual embedding model.
+        """
+        if not self.LANGUAGE_ROUTING:
+            return None
+        partition = detect_language(query) or language
+        if partition is None:
+            return None
+        needed = max(n_candidates, self.RETRIEVAL_CANDIDATES) if self._use_hybrid() else n_candidates
+        if self.lexical_index.partition_size(partition) < needed:
+            self.instrumentation.incr("retrieval_cross_language")
+            return None
+        self.instrumentation.incr("retrieval_partitioned")
+        return partition
+
+    def _retrieval_key(self, query: str, n_results: int, rerank: bool = False,
+                       partition: Optional[str] = None, prefilter: bool = True) -> Tuple:
+        """Memo key of a query's results on the current corpus.
+        
+        The memo is shared by every tutor of the process, so the key holds
+        every setting the results depend on. `prefilter=False` is for the
+        batch path, which never applies the lexical prefilter.
+        """
+        reranking = (self.RERANK_MODEL, self.RERANK_CANDIDATES, self.RERANK_MIN_SCORE) if rerank else None
+        hybrid = (self.RETRIEVAL_CANDIDATES, self.LEXICAL_PREFILTER and prefilter) \
+            if self._use_hybrid() else None
+        return (os.path.abspath(self.PERSIST_DIRECTORY), self.COLLECTION_NAME,
+                self.EMBEDDING_MODEL, self.QUANTIZATION, self.manifest.version, query, n_results,
+                hybrid, reranking, partition)
+
+    def _use_hybrid(self) -> bool:
+        """Whether lexical results should be fused into the dense ones."""
+        return self.HYBRID_RETRIEVAL and len(self.lexical_index) > 0
+
+    def _dense_index(self, collection: Optional[chromadb.Collection] = None):
+        """Index answering dense queries: the collection, or its quantized export."""
+        if collection is None:
+            collection = self.get_persistent_collection()
+        if self.QUANTIZATION is None:
+            return collection
+        return get_quantized_store(collection, self.PERSIST_DIRECTORY, self.COLLECTION_NAME,
+                                   self.manifest.version, self.QUANTIZATION)
+
+    def _hybrid_query(self, collection: chromadb.Collection, query: str,
+                      query_embedding: List[float], n_results: int,
+                      partition: Optional[str] = None) -> Dict:
+        """Fuse dense and BM25 candidates with reciprocal-rank fusion, in one language if given."""
+        n_candidates = max(n_results, self.RETRIEVAL_CANDIDATES)
+        lexical_hits = self.lexical_index.search(query, n_candidates, language=partition)
+        
+        filters = [{"language": partition}] if partition else []
+        if self.LEXICAL_PREFILTER and lexical_hits:
+            # Only search the documents that share terms with the query
+            sources = sorted({self.lexical_index.metadatas[doc_id]["source"]
+                              for doc_id, _ in lexical_hits})
+            filters.append({"source": {"$in": sources}})
+        dense = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_candidates,
+            where={"$and": filters} if len(filters) > 1 else (filters[0] if filters else None)
         )
+        return self._fuse_lexical(query, dense, n_results, lexical_hits)
 
-    def generate_response(self, query: str, context: str, 
-                         sources: List[str], language: str = "fr") -> str:
-        """Generate a friendly, engaging response using Claude."""
-        explanation_indicators = {
-            "fr": ["explique", "expliques", "décris", "comment", "pourquoi", 
-                  "qu'est-ce que", "quel est", "quelle est", "quels sont", "quelles sont"],
-            "en": ["explain", "describe", "how", "why", "what is", "what are"]
+    def _fuse_lexical(self, query: str, dense: Dict, n_results: int,
+                      lexical_hits: Optional[List[Tuple[str, float]]] = None,
+                      partition: Optional[str] = None) -> Dict:
+        """Fuse single-query dense results with BM25 hits into Chroma-shaped results."""
+        if lexical_hits is None:
+            lexical_hits = self.lexical_index.search(
+                query, max(n_results, self.RETRIEVAL_CANDIDATES), language=partition
+            )
+        dense_ids = dense["ids"][0]
+        fused = reciprocal_rank_fusion([dense_ids, [doc_id for doc_id, _ in lexical_hits]])
+        
+        dense_rows = {
+            doc_id: (document, metadata, distance)
+            for doc_id, document, metadata, distance in zip(
+                dense_ids, dense["documents"][0], dense["metadatas"][0], dense["distances"][0]
+            )
+        }
+        ids, documents, metadatas, distances = [], [], [], []
+        for doc_id, _ in fused:
+            if len(ids) == n_results:
+                break
+            if doc_id in dense_rows:
+                document, metadata, distance = dense_rows[doc_id]
+            else:
+                document = self.lexical_index.documents.get(doc_id)
+                metadata = self.lexical_index.metadatas.get(doc_id)
+                distance = None
+                if document is None:
+                    continue  # removed from the corpus since the search
+            ids.append(doc_id)
+            documents.append(document)
+            metadatas.append(metadata)
+            distances.append(distance)
+        
+        return {
+            "ids": [ids],
+            "documents": [documents],
+            "metadatas": [metadatas],
+            "distances": [distances]
         }
 
-        is_explanation_request = any(
-            indicator in query.lower() 
-            for indicator in explanation_indicators[language]
-        )
+    @traced("prompt_build")
+    def _build_response_prompt(self, query: str, context: str, language: str = "fr",
+                               history: str = "") -> str:
+        """Build the tutoring prompt sent to Claude for a student question."""
+        return build_response_prompt(query, context, language, history)
 
-        prompt = f"""{self.anthropic.HUMAN_PROMPT}
-You are a friendly and encouraging economics tutor who makes learning feel like an exciting conversation between friends. Your tone is warm and supportive, and you're genuinely interested in your student's thoughts and experiences.
+    def session_memory(self, conversation_history: List[Dict],
+                       session_id: Optional[str] = None) -> SessionMemory:
+        """Rolling memory of a conversation, kept per session ID between calls.
+        
+        Without a session ID the memory is rebuilt from the whole history.
+        """
+        memory = self._memories.get(session_id) if session_id is not None else None
+        if memory is None:
+            summarize = self._summarize_turns if self.MEMORY_SUMMARIZER == "llm" else None
+            memory = SessionMemory(self.HISTORY_TOKENS, summarize=summarize)
+            if session_id is not None:
+                self._memories.put(session_id, memory)
+        return memory.sync(conversation_history)
 
-Context from materials:
-{context}
+    def _history_text(self, conversation_history: Optional[List[Dict]],
+                      session_id: Optional[str] = None) -> str:
+        """Conversation rendered for a prompt, within HISTORY_TOKENS."""
+        if not conversation_history:
+            return ""
+        return self.session_memory(conversation_history, session_id).render()
 
-Student question: {query}
+    async def _ahistory_text(self, conversation_history: Optional[List[Dict]],
+                             session_id: Optional[str] = None) -> str:
+        """Async counterpart of _history_text, off the event loop since it may call Claude."""
+        if not conversation_history:
+            return ""
+        return await self._run_blocking("llm", self._history_text, conversation_history, session_id)
 
-Personality traits to convey:
-- Warm and welcoming
-- Genuinely enthusiastic about economics
-- Encouraging and supportive
-- Patient and understanding
-- Interested in student's perspectives
+    def _summarize_turns(self, summary: str, turns: List[Dict], max_tokens: int) -> str:
+        """Fold turns into a conversation summary with Claude, extractively if that fails."""
+        transcript = "\n".join(("Student: " if msg["role"] == "user" else "Tutor: ") + msg["content"]
+                               for msg in turns)
+        prompt = (f"{HUMAN_PROMPT}\nUpdate the summary of a tutoring conversation with the new turns. "
+                  f"Keep the concepts covered, the student's difficulties and open questions, "
+                  f"in at most {max_tokens * 3 // 4} words, in the language of the conversation.\n\n"
+                  f"Summary so far:\n{summary or '(empty)'}\n\nNew turns:\n{transcript}\n\n"
+                  f"Reply with the updated summary only.{AI_PROMPT}")
+        try:
+            with self.instrumentation.span("memory_summary"):
+                return self._complete(prompt, max_tokens=max_tokens, temperature=0.2).strip()
+        except Exception as e:
+            print(f"Summarizing the conversation failed: {str(e)}")
+            return extractive_summary(summary, turns, max_tokens)
 
-Communication style:
-- Use friendly openings like "{'Ah, belle question!' if language == 'fr' else 'Ah, great question!'}"
-- Add encouraging phrases
-- Show enthusiasm with occasional "!" and positive reinforcement
-- Use inclusive language to create a collaborative feeling
-- Keep a conversational, natural tone
+    def _error_message(self, error: Exception, language: str = "fr") -> str:
+        """Student-facing message for a failed generation."""
+        self.instrumentation.incr("errors")
+        if isinstance(error, LLMUnavailableError):
+            return ("Le tuteur est très sollicité en ce moment, veuillez réessayer dans un instant."
+                    if language == "fr" else
+                    "The tutor is very busy right now, please try again in a moment.")
+        error_prefix = "Désolé, une erreur s'est produite" if language == 'fr' else 'Sorry, an error occurred'
+        return f"{error_prefix}: {str(error)}"
 
-Choose ONE of these teaching patterns (or blend naturally if appropriate):
+    def _complete(self, prompt: str, max_tokens: int, temperature: float,
+                  priority: str = "interactive") -> str:
+        """Run a completion and return its text, raising once the LLM client gives up.
+        
+        `priority` is the LLM client's lane: "interactive" for students
+        waiting on the answer, "background" for work nobody is waiting on.
+        """
+        completion = self.llm.complete(prompt, max_tokens, temperature, priority)
+        self._count_tokens(prompt, completion)
+        return completion
 
-1. Friendly Socratic
-2. Relatable Examples
-3. Interactive Scenario
-4. Comparative Discussion
-5. Personal Connection
+    def _count_tokens(self, prompt: str, completion: str) -> None:
+        """Report estimated prompt and completion tokens of an LLM call."""
+        self.instrumentation.incr("prompt_tokens", estimate_tokens(prompt))
+        prefix = static_prefix(prompt)
+        if prefix is not None:
+            self.instrumentation.incr("prompt_prefix_tokens", prefix.tokens)
+        self.instrumentation.incr("completion_tokens", estimate_tokens(completion))
 
-Style requirements:
-- Keep responses warm and encouraging
-- Use **bold** for key concepts
-- Stay concise but friendly
-- End with an inviting question
+    def _stream_completion(self, prompt: str, max_tokens: int,
+                           temperature: float) -> Iterator[str]:
+        """Stream a completion as text deltas, raising on failure."""
+        requested = time.perf_counter()
+        started = False
+        deltas = []
+        for delta in self.llm.stream(prompt, max_tokens, temperature):
+            if not started:
+                # Match the non-streaming path, which strips leading whitespace
+                delta = delta.lstrip()
+                started = bool(delta)
+                if started:
+                    self.instrumentation.record("llm_first_token", time.perf_counter() - requested)
+            if delta:
+                deltas.append(delta)
+                yield delta
+        self.instrumentation.record("llm", time.perf_counter() - requested)
+        self._count_tokens(prompt, "".join(deltas))
 
-Response language: {'French' if language == 'fr' else 'English'}
+    def generate_response(self, query: str, context: str, 
+                         sources: List[str], language: str = "fr",
+                         conversation_history: Optional[List[Dict]] = None,
+                         session_id: Optional[str] = None) -> str:
+        """Generate a friendly, engaging response using Claude."""
+        prompt = self._build_response_prompt(query, context, language,
+                                             self._history_text(conversation_history, session_id))
 
-Create a friendly, engaging response using your chosen pattern.{self.anthropic.AI_PROMPT}"""
+        try:
+            return self._complete(prompt, max_tokens=800, temperature=0.75).strip()
+        except Exception as e:
+            return self._error_message(e, language)
+
+    def stream_response(self, query: str, context: str,
+                        sources: List[str], language: str = "fr",
+                        conversation_history: Optional[List[Dict]] = None,
+                        session_id: Optional[str] = None) -> Iterator[str]:
+        """Stream the response to a question from Claude as text deltas."""
+        prompt = self._build_response_prompt(query, context, language,
+                                             self._history_text(conversation_history, session_id))
 
         try:
-            response = self.anthropic.completions.create(
-                model="claude-2",
-                prompt=prompt,
-                max_tokens_to_sample=800,
-                temperature=0.75
-            )
-            
-            return response.completion.strip()
+            yield from self._stream_completion(prompt, max_tokens=800, temperature=0.75)
         except Exception as e:
-            return f"{'Désolé, une erreur s\'est produite' if language == 'fr' else 'Sorry, an error occurred'}: {str(e)}"
+            yield self._error_message(e, language)
+
+    def _embed_query(self, query: str) -> List[float]:
+        """Embed a question with the shared embedding model, memoized per query text."""
+        key = (self.EMBEDDING_MODEL, query)
+        embedding = self._embedding_memo.get(key)
+        if embedding is None:
+            with self.instrumentation.span("embed_query"):
+                embedding = self.hf_embed([query])[0]
+            self._embedding_memo.put(key, embedding)
+        return embedding
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many questions with one model call for those not memoized yet."""
+        embeddings = {query: self._embedding_memo.get((self.EMBEDDING_MODEL, query))
+                      for query in queries}
+        missing = [query for query, embedding in embeddings.items() if embedding is None]
+        if missing:
+            with self.instrumentation.span("embed_query", batch=len(missing)):
+                vectors = self.hf_embed(missing)
+            for query, embedding in zip(missing, vectors):
+                embeddings[query] = embedding
+                self._embedding_memo.put((self.EMBEDDING_MODEL, query), embedding)
+        return [embeddings[query] for query in queries]
+
+    def _lookup_cached_response(self, query_embedding: List[float], language: str,
+                                history: str = "") -> Optional[str]:
+        """Answer cached for a similar question on the current corpus, if any.
+        
+        Answers to questions asked within a conversation depend on it, so
+        they are neither looked up nor stored.
+        """
+        if self.response_cache is None or history:
+            return None
+        with self.instrumentation.span("cache_lookup"):
+            cached = self.response_cache.lookup(language, query_embedding, self.manifest.version)
+        self.instrumentation.incr("cache_hits" if cached is not None else "cache_misses")
+        return cached
 
-    def handle_question(self, query: str, language: str = "fr") -> str:
-        """Main handler for processing questions."""
+    def _store_cached_response(self, query: str, query_embedding: List[float], response: str,
+                               language: str, prompt: str, latency_s: float,
+                               history: str = "") -> None:
+        """Cache a freshly generated answer, unless it depends on a conversation."""
+        if self.response_cache is not None and not history:
+            self.response_cache.store(language, query, query_embedding, response,
+                                      self.manifest.version, latency_s, prompt)
+
+    def _retrieve_context(self, query: str,
+                          query_embedding: Optional[List[float]] = None,
+                          language: Optional[str] = None) -> Tuple[str, List[str]]:
+        """Retrieve the context and sources for a question."""
+        results = self.query_documents(query, query_embedding=query_embedding, language=language)
+        return self.context_assembler.assemble(results)
+
+    @traced("handle_question")
+    def handle_question(self, query: str, language: str = "fr",
+                        conversation_history: Optional[List[Dict]] = None,
+                        session_id: Optional[str] = None) -> str:
+        """Main handler for processing questions.
+        
+        Answers to questions similar to one already answered on the same
+        corpus are served from the semantic response cache, except within a
+        conversation, whose answers depend on what was said before.
+        
+        Args:
+            query: The student's question
+            language: Language of the answer (fr or en)
+            conversation_history: Earlier messages with 'role' and 'content',
+                summarized into the prompt within HISTORY_TOKENS
+            session_id: Identifies the conversation, so its memory is updated
+                incrementally instead of rebuilt on every question
+        """
         try:
             collection = self.get_persistent_collection()
             
             if collection.count() == 0:
                 return "Le corpus est vide." if language == "fr" else "The corpus is empty."
-                
-            results = self.query_documents(query)
-            context = " ".join(results["documents"][0])
-            sources = [meta["source"] for meta in results["metadatas"][0]]
             
-            return self.generate_response(query, context, sources, language)
+            started = time.perf_counter()
+            history = self._history_text(conversation_history, session_id)
+            query_embedding = self._embed_query(query)
+            cached = self._lookup_cached_response(query_embedding, language, history)
+            if cached is not None:
+                return cached
+                
+            context, sources = self._retrieve_context(query, query_embedding, language)
             
         except Exception as e:
+            self.instrumentation.incr("errors")
             return f"{'Erreur' if language == 'fr' else 'Error'}: {str(e)}"
+            
+        prompt = self._build_response_prompt(query, context, language, history)
+        try:
+            response = self._complete(prompt, max_tokens=800, temperature=0.75).strip()
+        except Exception as e:
+            return self._error_message(e, language)
+            
+        self._store_cached_response(query, query_embedding, response, language, prompt,
+                                    time.perf_counter() - started, history)
+        return response
+
+    def handle_question_stream(self, query: str, language: str = "fr",
+                               conversation_history: Optional[List[Dict]] = None,
+                               session_id: Optional[str] = None) -> Iterator[str]:
+        """Streaming counterpart of handle_question, yielding the answer as text deltas."""
+        try:
+            collection = self.get_persistent_collection()
+            
+            if collection.count() == 0:
+                yield "Le corpus est vide." if language == "fr" else "The corpus is empty."
+                return
+            
+            started = time.perf_counter()
+            history = self._history_text(conversation_history, session_id)
+            query_embedding = self._embed_query(query)
+            cached = self._lookup_cached_response(query_embedding, language, history)
+            if cached is not None:
+                yield cached
+                return
+                
+            context, sources = self._retrieve_context(query, query_embedding, language)
+        except Exception as e:
+            self.instrumentation.incr("errors")
+            yield f"{'Erreur' if language == 'fr' else 'Error'}: {str(e)}"
+            return
+            
+        prompt = self._build_response_prompt(query, context, language, history)
+        deltas = []
+        try:
+            for delta in self._stream_completion(prompt, max_tokens=800, temperature=0.75):
+                deltas.append(delta)
+                yield delta
+        except Exception as e:
+            yield self._error_message(e, language)
+            return
+            
+        self._store_cached_response(query, query_embedding, "".join(deltas).rstrip(), language,
+                                    prompt, time.perf_counter() - started, history)
+
+    def handle_questions(self, questions: List[str], language: str = "fr",
+                         max_concurrency: int = 8) -> List[str]:
+        """Answer a batch of questions, in input order.
+        
+        Failed questions get the same messages as handle_question; use
+        answer_questions to tell them apart from answers.
+        """
+        return [result["answer"] for result in
+                self.answer_questions(questions, language, max_concurrency)]
+
+    @traced("handle_questions")
+    def answer_questions(self, questions: List[str], language: str = "fr",
+                         max_concurrency: int = 8) -> List[Dict]:
+        """Answer a batch of questions as {"answer", "error"} dicts, in input order.
+        
+        All questions are embedded in one call and retrieved with one vector
+        search; cached and duplicate questions are answered once. LLM calls
+        then run with bounded parallelism and back off on rate limits, so
+        throughput grows with `max_concurrency` rather than with the number
+        of questions. "error" is None for answered questions; for failed ones
+        it describes the failure and "answer" is the student-facing message.
+        """
+        if not questions:
+            return []
+        try:
+            collection = self.get_persistent_collection()
+            
+            if collection.count() == 0:
+                message = "Le corpus est vide." if language == "fr" else "The corpus is empty."
+                return [{"answer": message, "error": "The corpus is empty."} for _ in questions]
+            
+            started = time.perf_counter()
+            embeddings = dict(zip(questions, self._embed_queries(questions)))
+            answers = {}
+            for question, embedding in embeddings.items():
+                cached = self._lookup_cached_response(embedding, language)
+                answers[question] = None if cached is None else {"answer": cached, "error": None}
+            pending = [question for question, answer in answers.items() if answer is None]
+            results = self.query_documents_batch(
+                pending, query_embeddings=[embeddings[question] for question in pending],
+                language=language
+            )
+            retrieval_s = time.perf_counter() - started
+            
+        except Exception as e:
+            self.instrumentation.incr("errors")
+            message = f"{'Erreur' if language == 'fr' else 'Error'}: {str(e)}"
+            return [{"answer": message, "error": str(e)} for _ in questions]
+        
+        def answer(question: str, result: Dict) -> Dict:
+            context, _ = self.context_assembler.assemble(result)
+            prompt = self._build_response_prompt(question, context, language)
+            started = time.perf_counter()
+            try:
+                response = self._complete(prompt, max_tokens=800, temperature=0.75,
+                                          priority="background").strip()
+            except Exception as e:
+                return {"answer": self._error_message(e, language), "error": str(e)}
+            self._store_cached_response(question, embeddings[question], response, language, prompt,
+                                        retrieval_s + time.perf_counter() - started)
+            return {"answer": response, "error": None}
+        
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            for question, response in zip(pending, pool.map(answer, pending, results)):
+                answers[question] = response
+        
+        return [dict(answers[question]) for question in questions]
 
+    @traced("generate_quiz")
     def generate_quiz(self, conversation_history: List[Dict], 
                      topic: str, difficulty: str = "intermediate", 
-                     language: str = "fr") -> str:
+                     language: str = "fr", session_id: Optional[str] = None) -> str:
         """
         Generate an interactive quiz about the given topic.
         
@@ -235,85 +982,236 @@ Create a friendly, engaging response using your chosen pattern.{self.anthropic.A
             topic: The economics topic to generate questions about
             difficulty: Difficulty level of the quiz (beginner, intermediate, advanced)
             language: Language for the quiz (fr or en)
+            session_id: Identifies the conversation, as for handle_question
             
         Returns:
             JSON string containing quiz questions and answers
         """
+        banked = self._take_banked_quiz(topic, difficulty, language)
+        if banked is not None:
+            return banked
+        
         try:
-            results = self.query_documents(topic)
-            corpus_context = " ".join(results["documents"][0]) if results["documents"] else ""
+            version = self.manifest.version
+            results = self.query_documents(topic, rerank=False, language=language)
+            history = self._history_text(conversation_history, session_id)
+            prompt = self._build_quiz_prompt(results, history, topic, language)
+
+            quiz = self._complete_quiz(prompt)
+            self._bank_quiz(topic, difficulty, language, version, quiz, history)
+            return quiz
             
-            conv_text = "\n".join([
-                f"Q: {msg['content']}" if msg['role'] == 'user' else f"A: {msg['content']}"
-                for msg in conversation_history
-            ])
-
-            prompt = f"""{self.anthropic.HUMAN_PROMPT}
-Create an interactive economics quiz about {topic}. Return ONLY the JSON structure below with no additional text or explanations.
-
-Context from materials:
-{corpus_context}
-{conv_text}
-
-Return EXACTLY this structure and nothing else (no introduction or extra text):
-{{
-    "questions": [
-        {{
-            "question": "Write the first question here",
-            "options": [
-                {{
-                    "text": "Correct answer",
-                    "correct": true,
-                    "explanation": "Why this is correct"
-                }},
-                {{
-                    "text": "Wrong answer 1",
-                    "correct": false,
-                    "explanation": "Why this is incorrect"
-                }},
-                {{
-                    "text": "Wrong answer 2",
-                    "correct": false,
-                    "explanation": "Why this is incorrect"
-                }}
-            ]
-        }},
-        {{
-            "question": "Write the second question here",
-            "options": [Similar structure]
-        }},
-        {{
-            "question": "Write the third question here",
-            "options": [Similar structure]
-        }}
-    ]
-}}{self.anthropic.AI_PROMPT}"""
+        except Exception as e:
+            return self._quiz_error(e)
+
+    def _complete_quiz(self, prompt: str, background: bool = False) -> str:
+        """Generate a quiz, retrying up to QUIZ_ATTEMPTS times when the completion fails validation."""
+        priority = "background" if background else "interactive"
+        for attempt in range(1, self.QUIZ_ATTEMPTS + 1):
+            completion = self._complete(prompt, max_tokens=2000, temperature=0.7, priority=priority)
+            try:
+                return self._parse_quiz_response(completion)
+            except ValueError:
+                if attempt == self.QUIZ_ATTEMPTS:
+                    raise
+                self.instrumentation.incr("quiz_retries")
+
+    def _take_banked_quiz(self, topic: str, difficulty: str, language: str) -> Optional[str]:
+        """Serve a pre-generated quiz if the bank holds one, and schedule its refill.
+        
+        Banked quizzes are built without conversation history, which only
+        personalizes quizzes generated on demand. Only topics the bank
+        maintains are refilled, so a one-off topic costs no background calls.
+        """
+        if self.quiz_bank is None:
+            return None
+        version = self.manifest.version
+        quiz = self.quiz_bank.take(topic, difficulty, language, version)
+        self.instrumentation.incr("quiz_bank_hits" if quiz is not None else "quiz_bank_misses")
+        if self.quiz_bank.maintains(topic, difficulty, language):
+            self.quiz_bank.refill(topic, difficulty, language, version, self._generate_banked_quiz)
+        return quiz
+
+    def _bank_quiz(self, topic: str, difficulty: str, language: str, version: str,
+                   quiz: str, history: str) -> None:
+        """Keep a quiz generated on demand for the next request, unless it is personalized."""
+        if self.quiz_bank is not None and not history:
+            self.quiz_bank.put(topic, difficulty, language, version, quiz)
+
+    def _generate_banked_quiz(self, topic: str, difficulty: str, language: str) -> str:
+        """Quiz generator run by the quiz bank's background workers."""
+        with self.instrumentation.span("quiz_bank_fill"):
+            results = self.query_documents(topic, rerank=False, language=language)
+            prompt = self._build_quiz_prompt(results, "", topic, language)
+            return self._complete_quiz(prompt, background=True)
+
+    def prefill_quiz_bank(self, topics: Optional[List[str]] = None,
+                          difficulties: Tuple[str, ...] = ("intermediate",),
+                          languages: Tuple[str, ...] = ("fr",)) -> int:
+        """Fill the quiz bank in the background for a list of topics.
+        
+        Prefilling costs depth completions per topic, so it is left to
+        long-running processes (the HTTP service and the Streamlit app) to
+        call; nothing is scheduled while the corpus is empty.
+        
+        Args:
+            topics: Topics to prepare; defaults to the questions of the syllabus
+                (programme_ses.pdf) when it is in the corpus directory
+            difficulties: Difficulty levels to prepare
+            languages: Languages to prepare
+            
+        Returns:
+            Number of quizzes scheduled
+        """
+        if self.quiz_bank is None or self.get_persistent_collection().count() == 0:
+            return 0
+        if topics is None:
+            syllabus = os.path.join(self.INITIAL_CORPUS_DIR, SYLLABUS_FILENAME)
+            topics = syllabus_topics(syllabus) if os.path.exists(syllabus) else []
+        version = self.manifest.version
+        scheduled = sum(
+            self.quiz_bank.refill(topic, difficulty, language, version, self._generate_banked_quiz)
+            for topic in topics for difficulty in difficulties for language in languages
+        )
+        if scheduled:
+            print(f"Generating {scheduled} quizzes for {len(topics)} topics in the background")
+        return scheduled
+
+    @traced("prompt_build")
+    def _build_quiz_prompt(self, results: Dict, history: str, topic: str,
+                           language: str = "fr") -> str:
+        """Build the quiz generation prompt from retrieval results and the rendered conversation."""
+        corpus_context, _ = self.context_assembler.assemble(results)
+        return build_quiz_prompt(topic, corpus_context, language, history)
+
+    def _parse_quiz_response(self, completion: str) -> str:
+        """Extract and validate the quiz JSON from a Claude completion."""
+        # Clean and validate the response
+        cleaned_response = completion.strip()
+        start_idx = cleaned_response.find('{')
+        end_idx = cleaned_response.rfind('}') + 1
+        if start_idx != -1 and end_idx != 0:
+            cleaned_response = cleaned_response[start_idx:end_idx]
+
+        # Validate JSON structure
+        quiz_json = json.loads(cleaned_response)
+        self._validate_quiz_structure(quiz_json)
+        
+        return cleaned_response
+
+    def _quiz_error(self, error: Exception) -> str:
+        """JSON error payload returned when quiz generation fails."""
+        self.instrumentation.incr("errors")
+        return json.dumps({
+            "error": f"Quiz generation failed: {str(error)}",
+            "raw_response": ""
+        })
 
-            response = self.anthropic.completions.create(
-                model="claude-2",
-                prompt=prompt,
-                max_tokens_to_sample=2000,
-                temperature=0.7
+    async def _run_blocking(self, stage: str, func, *args, **kwargs):
+        """Run blocking work on the shared executor, bounded by the stage's concurrency limit."""
+        async with get_stage_semaphore(stage, self.STAGE_LIMITS[stage]):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                get_executor(), functools.partial(func, *args, **kwargs)
             )
 
-            # Clean and validate the response
-            cleaned_response = response.completion.strip()
-            start_idx = cleaned_response.find('{')
-            end_idx = cleaned_response.rfind('}') + 1
-            if start_idx != -1 and end_idx != 0:
-                cleaned_response = cleaned_response[start_idx:end_idx]
+    async def _acomplete(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        """Run a completion on the async Anthropic client, bounded by the LLM stage limit."""
+        queued = time.perf_counter()
+        async with get_stage_semaphore("llm", self.STAGE_LIMITS["llm"]):
+            self.instrumentation.record("llm_queue", time.perf_counter() - queued)
+            completion = await self.llm.acomplete(prompt, max_tokens, temperature)
+        self._count_tokens(prompt, completion)
+        return completion
 
-            # Validate JSON structure
-            quiz_json = json.loads(cleaned_response)
-            self._validate_quiz_structure(quiz_json)
+    async def agenerate_response(self, query: str, context: str,
+                                 sources: List[str], language: str = "fr",
+                                 conversation_history: Optional[List[Dict]] = None,
+                                 session_id: Optional[str] = None) -> str:
+        """Async counterpart of generate_response."""
+        history = await self._ahistory_text(conversation_history, session_id)
+        prompt = self._build_response_prompt(query, context, language, history)
+
+        try:
+            completion = await self._acomplete(prompt, max_tokens=800, temperature=0.75)
+            return completion.strip()
+        except Exception as e:
+            return self._error_message(e, language)
+
+    @traced("handle_question")
+    async def ahandle_question(self, query: str, language: str = "fr",
+                               conversation_history: Optional[List[Dict]] = None,
+                               session_id: Optional[str] = None) -> str:
+        """Async counterpart of handle_question.
+        
+        Retrieval runs on the shared executor so the event loop only waits on
+        the LLM call, letting one worker keep many questions in flight.
+        """
+        try:
+            collection = await self._run_blocking("retrieval", self.get_persistent_collection)
+            count = await self._run_blocking("retrieval", collection.count)
+            
+            if count == 0:
+                return "Le corpus est vide." if language == "fr" else "The corpus is empty."
             
-            return cleaned_response
+            started = time.perf_counter()
+            history = await self._ahistory_text(conversation_history, session_id)
+            query_embedding = await self._run_blocking("retrieval", self._embed_query, query)
+            cached = self._lookup_cached_response(query_embedding, language, history)
+            if cached is not None:
+                return cached
+                
+            context, sources = await self._run_blocking(
+                "retrieval", self._retrieve_context, query, query_embedding, language
+            )
             
         except Exception as e:
-            return json.dumps({
-                "error": f"Quiz generation failed: {str(e)}",
-                "raw_response": ""
-            })
+            self.instrumentation.incr("errors")
+            return f"{'Erreur' if language == 'fr' else 'Error'}: {str(e)}"
+            
+        prompt = self._build_response_prompt(query, context, language, history)
+        try:
+            response = (await self._acomplete(prompt, max_tokens=800, temperature=0.75)).strip()
+        except Exception as e:
+            return self._error_message(e, language)
+            
+        self._store_cached_response(query, query_embedding, response, language, prompt,
+                                    time.perf_counter() - started, history)
+        return response
+
+    @traced("generate_quiz")
+    async def agenerate_quiz(self, conversation_history: List[Dict],
+                             topic: str, difficulty: str = "intermediate",
+                             language: str = "fr", session_id: Optional[str] = None) -> str:
+        """Async counterpart of generate_quiz."""
+        banked = self._take_banked_quiz(topic, difficulty, language)
+        if banked is not None:
+            return banked
+        
+        try:
+            version = self.manifest.version
+            results = await self._run_blocking("retrieval", self.query_documents, topic,
+                                                rerank=False, language=language)
+            history = await self._ahistory_text(conversation_history, session_id)
+            prompt = self._build_quiz_prompt(results, history, topic, language)
+
+            for attempt in range(1, self.QUIZ_ATTEMPTS + 1):
+                completion = await self._acomplete(prompt, max_tokens=2000, temperature=0.7)
+                try:
+                    quiz = self._parse_quiz_response(completion)
+                    self._bank_quiz(topic, difficulty, language, version, quiz, history)
+                    return quiz
+                except ValueError:
+                    if attempt == self.QUIZ_ATTEMPTS:
+                        raise
+                    self.instrumentation.incr("quiz_retries")
+            
+        except Exception as e:
+            return self._quiz_error(e)
+
+    async def aadd_document(self, pdf_path: str) -> chromadb.Collection:
+        """Async counterpart of add_document_to_corpus."""
+        return await self._run_blocking("ingest", self.add_document_to_corpus, pdf_path)
 
     def _validate_quiz_structure(self, quiz_json: Dict) -> None:
         """Validate the structure of the generated quiz JSON."""
@@ -332,7 +1230,7 @@ Return EXACTLY this structure and nothing else (no introduction or extra text):
 def main():
     """Main function to demonstrate usage."""
     # Initialize the tutor
-    tutor = EconomicsTutor()
+    tutor = EconomicsTutor(quiz_bank=False)
     
     # Example questions
     questions = [
@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Set
+
+
+def read_questions(path: str) -> Iterator[Dict]:
+    """Yield question records from a JSONL file, numbering those without an ID by line."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            record.setdefault("id", line_no)
+            yield record
+
+
+def answered_ids(path: str) -> Set[str]:
+    """IDs answered in an output file, so an interrupted run can resume.
+
+    Rows with an "error" are not counted, so a rerun retries those questions.
+    """
+    if not os.path.exists(path):
+        return set()
+    ids = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+                if not row.get("error"):
+                    ids.add(str(row["id"]))
+            except (ValueError, KeyError):
+                # Last line of a run killed mid-write
+                continue
+    return ids
+
+
+def answer_file(tutor, input_path: str, output_path: str, batch_size: int = 64,
+                default_language: str = "fr", concurrency: int = 8) -> Dict:
+    """Answer every question of a JSONL file, appending answers to another.
+
+    Questions are answered in chunks of `batch_size`; each chunk's answers are
+    flushed before the next starts, which is the checkpoint a rerun resumes from.
+    Failed questions are written with a null "answer" and an "error", and are
+    asked again by the next run; the last row of an ID is the one that counts.
+    """
+    done = answered_ids(output_path)
+    pending = [r for r in read_questions(input_path) if str(r["id"]) not in done]
+    print(f"{len(done)} questions already answered, {len(pending)} to go")
+
+    failed = 0
+    started = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out:
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            by_language: Dict[str, List[Dict]] = {}
+            for record in chunk:
+                by_language.setdefault(record.get("language", default_language), []).append(record)
+            for language, records in by_language.items():
+                results = tutor.answer_questions(
+                    [r["question"] for r in records], language=language, max_concurrency=concurrency
+                )
+                for record, result in zip(records, results):
+                    row = {"id": record["id"], "question": record["question"], "language": language,
+                           "answer": result["answer"] if result["error"] is None else None}
+                    if result["error"] is not None:
+                        row["error"] = result["error"]
+                        failed += 1
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+            print(f"Answered {min(start + batch_size, len(pending))}/{len(pending)} questions")
+
+    seconds = time.perf_counter() - started
+    return {
+        "answered": len(pending) - failed,
+        "failed": failed,
+        "skipped": len(done),
+        "seconds": seconds,
+        "questions_per_s": len(pending) / seconds if seconds else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer a JSONL file of questions ({\"id\", \"question\", \"language\"} per line)."
+    )
+    parser.add_argument("input", help="JSONL file of questions")
+    parser.add_argument("output", help="JSONL file answers are appended to; reruns skip answered IDs")
+    parser.add_argument("--language", default="fr", help="Language of questions that do not set one")
+    parser.add_argument("--batch-size", type=int, default=64, help="Questions per checkpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel LLM calls")
+    args = parser.parse_args()
+
+    from AI_tutor import EconomicsTutor
+
+    tutor = EconomicsTutor(quiz_bank=False)
+    tutor.initialize_corpus()
+    stats = answer_file(tutor, args.input, args.output, batch_size=args.batch_size,
+                        default_language=args.language, concurrency=args.concurrency)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+import argparse
+import asyncio
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from instrumentation import InMemoryHistogramExporter, Instrumentation
+from resources import peak_rss_mb
+
+HUMAN_PROMPT = "\n\nHuman:"
+AI_PROMPT = "\n\nAssistant:"
+
+CANNED_ANSWER = (
+    "Ah, belle question ! La **croissance économique** correspond à l'augmentation "
+    "durable de la production de biens et services, mesurée par le **PIB** réel. "
+    "Elle dépend de l'accumulation du capital, du travail et du progrès technique. "
+    "Regardons ensemble un exemple : si le PIB passe de 100 à 103, la croissance est de 3 %. "
+    "Qu'en pensez-vous, quels facteurs expliquent le mieux la croissance de votre pays ?"
+)
+
+CANNED_QUIZ = {
+    "questions": [
+        {
+            "question": f"Question {i + 1} sur le PIB",
+            "options": [
+                {"text": "Bonne réponse", "correct": True, "explanation": "C'est correct."},
+                {"text": "Mauvaise réponse 1", "correct": False, "explanation": "C'est faux."},
+                {"text": "Mauvaise réponse 2", "correct": False, "explanation": "C'est faux."}
+            ]
+        }
+        for i in range(3)
+    ]
+}
+
+BENCHMARK_QUESTIONS = [
+    "Explique moi la croissance économique",
+    "Quel est le meilleur taux d'inflation?",
+    "Comment fonctionne le marché du travail?",
+    "Est-ce que le chômage peut être égal à zéro?",
+    "Qu'est-ce que le PIB?",
+    "Quel est le rôle de la BCE?",
+    "Explique le modèle IS-LM",
+    "What is economic growth?"
+]
+
+
+class _FakeCompletion:
+    def __init__(self, completion: str):
+        self.completion = completion
+
+
+class FakeCompletions:
+    """Stand-in for `Anthropic().completions` with a configurable speed."""
+
+    def __init__(self, latency_s: float, tokens_per_s: float, answer: str, quiz_json: str):
+        self.latency_s = latency_s
+        self.tokens_per_s = tokens_per_s
+        self.answer = answer
+        self.quiz_json = quiz_json
+
+    def _text(self, prompt: str) -> str:
+        return self.quiz_json if "quiz" in prompt[:400].lower() else self.answer
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        # Roughly four characters per token
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    def create(self, model: str, prompt: str, max_tokens_to_sample: int,
+               temperature: float = 1.0, stream: bool = False, **kwargs):
+        tokens = self._tokens(self._text(prompt))[:max_tokens_to_sample]
+        if stream:
+            return self._stream(tokens)
+        time.sleep(self.latency_s + len(tokens) / self.tokens_per_s)
+        return _FakeCompletion("".join(tokens))
+
+    def _stream(self, tokens: List[str]):
+        time.sleep(self.latency_s)
+        for token in tokens:
+            time.sleep(1 / self.tokens_per_s)
+            yield _FakeCompletion(token)
+
+
+class FakeAsyncCompletions(FakeCompletions):
+    """Stand-in for `AsyncAnthropic().completions`."""
+
+    async def create(self, model: str, prompt: str, max_tokens_to_sample: int,
+                     temperature: float = 1.0, **kwargs):
+        tokens = self._tokens(self._text(prompt))[:max_tokens_to_sample]
+        await asyncio.sleep(self.latency_s + len(tokens) / self.tokens_per_s)
+        return _FakeCompletion("".join(tokens))
+
+
+class FakeAnthropic:
+    """Offline Anthropic client returning canned answers and quizzes.
+
+    Args:
+        latency_s: Time to first token
+        tokens_per_s: Generation speed after the first token
+        answer: Text returned for tutoring prompts
+        quiz_json: Text returned for quiz prompts
+    """
+
+    HUMAN_PROMPT = HUMAN_PROMPT
+    AI_PROMPT = AI_PROMPT
+    completions_class = FakeCompletions
+
+    def __init__(self, latency_s: float = 0.5, tokens_per_s: float = 60.0,
+                 answer: str = CANNED_ANSWER, quiz_json: Optional[str] = None):
+        self.completions = self.completions_class(
+            latency_s, tokens_per_s, answer, quiz_json or json.dumps(CANNED_QUIZ)
+        )
+
+
+class FakeAsyncAnthropic(FakeAnthropic):
+    """Offline async Anthropic client."""
+
+    completions_class = FakeAsyncCompletions
+
+
+class HashingEmbeddingFunction:
+    """Deterministic bag-of-words embedder for runs without the MiniLM model."""
+
+    model_name = "hashing-384"
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        vectors = np.zeros((len(input), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(input):
+            for word in text.lower().split():
+                digest = hashlib.md5(word.encode("utf-8")).digest()
+                vectors[row, int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms == 0, 1, norms)).tolist()
+
+
+def percentiles(samples: List[float]) -> Dict:
+    """p50/p90/p99/mean of a list of latencies in seconds."""
+    if not samples:
+        return {"p50_s": None, "p90_s": None, "p99_s": None, "mean_s": None, "n": 0}
+    values = np.asarray(samples)
+    return {
+        "p50_s": float(np.percentile(values, 50)),
+        "p90_s": float(np.percentile(values, 90)),
+        "p99_s": float(np.percentile(values, 99)),
+        "mean_s": float(values.mean()),
+        "n": len(samples)
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_ingestion(tutor) -> Dict:
+    """Cold-start indexing of the corpus directory."""
+    started = time.perf_counter()
+    tutor.initialize_corpus()
+    seconds = time.perf_counter() - started
+    stats = tutor.last_ingestion_stats
+    return {
+        "files": stats["files"],
+        "pages": stats["pages"],
+        "chunks": stats["chunks"],
+        "seconds": seconds,
+        "pages_per_s": stats["pages"] / seconds if seconds else None,
+        "chunks_per_s": stats["chunks"] / seconds if seconds else None
+    }
+
+
+def bench_embedding(tutor, batch_size: int = 64) -> Dict:
+    """Embedding throughput over every chunk of the corpus."""
+    documents = tutor.get_persistent_collection().get(include=["documents"])["documents"]
+    started = time.perf_counter()
+    for start in range(0, len(documents), batch_size):
+        tutor.hf_embed(documents[start:start + batch_size])
+    seconds = time.perf_counter() - started
+    return {
+        "chunks": len(documents),
+        "batch_size": batch_size,
+        "seconds": seconds,
+        "chunks_per_s": len(documents) / seconds if seconds else None
+    }
+
+
+def bench_retrieval(tutor, repeats: int) -> Dict:
+    """Latency of query_documents with memos cleared, so every call embeds and searches."""
+    samples = []
+    for _ in range(repeats):
+        for question in BENCHMARK_QUESTIONS:
+            tutor._embedding_memo.clear()
+            tutor._retrieval_memo.clear()
+            started = time.perf_counter()
+            tutor.query_documents(question)
+            samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def bench_end_to_end(tutor, users: int, questions_per_user: int) -> Dict:
+    """handle_question latency with `users` students asking concurrently."""
+    def ask(index: int) -> float:
+        question = BENCHMARK_QUESTIONS[index % len(BENCHMARK_QUESTIONS)]
+        started = time.perf_counter()
+        tutor.handle_question(f"{question} ({index})")
+        return time.perf_counter() - started
+
+    total = users * questions_per_user
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        samples = list(pool.map(ask, range(total)))
+    seconds = time.perf_counter() - started
+    return {
+        "users": users,
+        "questions": total,
+        "seconds": seconds,
+        "questions_per_s": total / seconds if seconds else None,
+        **percentiles(samples)
+    }
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict:
+    """Run every benchmark against a throwaway copy of the corpus."""
+    from AI_tutor import EconomicsTutor
+
+    stages = InMemoryHistogramExporter()
+    workdir = tempfile.mkdtemp(prefix="tutor-bench-")
+    try:
+        corpus_dir = os.path.join(workdir, "corpus")
+        os.makedirs(corpus_dir)
+        for pdf_path in glob.glob(os.path.join(args.corpus, "*.pdf")):
+            shutil.copy(pdf_path, corpus_dir)
+
+        tutor = EconomicsTutor(
+            persist_directory=os.path.join(workdir, "db"),
+            corpus_dir=corpus_dir,
+            response_cache=False,
+            quiz_bank=False,
+            anthropic_client=FakeAnthropic(args.llm_latency, args.llm_tokens_per_s),
+            async_anthropic_client=FakeAsyncAnthropic(args.llm_latency, args.llm_tokens_per_s),
+            embedding_function=HashingEmbeddingFunction() if args.embedder == "hashing" else None,
+            instrumentation=Instrumentation([stages])
+        )
+
+        results = {
+            "ingestion": bench_ingestion(tutor),
+            "embedding": bench_embedding(tutor),
+            "retrieval": bench_retrieval(tutor, args.retrieval_repeats),
+            "end_to_end": bench_end_to_end(tutor, args.users, args.questions_per_user)
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results["stages"] = stages.snapshot()
+    results["peak_rss_mb"] = peak_rss_mb()
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the tutor pipeline offline with a stand-in LLM."
+    )
+    parser.add_argument("--corpus", default="initial_corpus", help="Directory of PDFs to index")
+    parser.add_argument("--embedder", choices=["minilm", "hashing"], default="minilm",
+                        help="Real MiniLM model (must be cached locally) or a hashing embedder")
+    parser.add_argument("--llm-latency", type=float, default=0.5,
+                        help="Fake LLM time to first token in seconds")
+    parser.add_argument("--llm-tokens-per-s", type=float, default=60.0,
+                        help="Fake LLM generation speed")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent users")
+    parser.add_argument("--questions-per-user", type=int, default=4)
+    parser.add_argument("--retrieval-repeats", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    # Keep progress messages out of the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = json.dumps(run_benchmarks(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
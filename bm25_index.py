@@ -0,0 +1,183 @@
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+INDEX_FILENAME = "bm25_{collection_name}.json"
+
+# Words too common in course material to help ranking
+STOPWORDS = set("""
+a au aux avec ce ces dans de des du elle en et eux il ils je la le les leur lui ma mais me
+meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes
+toi ton tu un une vos votre vous c d j l m n s t y est sont ete etre avoir a ont cette cet
+comme plus ou donc est-ce quoi
+the of and to in is are was were be been for on that this with as by it an or at from what
+which how why do does
+""".split())
+
+# Words, numbers and hyphenated terms such as "is-lm" or "covid-19"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-/][a-z0-9]+)*")
+
+_indexes: Dict[str, "BM25Index"] = {}
+_indexes_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, accent-free terms of a text.
+
+    Hyphenated terms are kept whole and also split into their parts, so both
+    "IS-LM" and "LM" match a chunk mentioning the IS-LM model.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    terms = []
+    for token in TOKEN_PATTERN.findall(text):
+        parts = re.split(r"[-/]", token)
+        if len(parts) > 1 and token not in STOPWORDS:
+            terms.append(token)
+        terms.extend(part for part in parts
+                     if part not in STOPWORDS and (len(part) > 1 or part.isdigit()))
+    return terms
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several ranked ID lists into one, best first.
+
+    Each ID scores sum(1 / (k + rank)) over the rankings it appears in.
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def load_bm25_index(persist_directory: str, collection_name: str) -> "BM25Index":
+    """Return the process-wide BM25 index of a collection stored in the given directory."""
+    path = os.path.abspath(os.path.join(
+        persist_directory, INDEX_FILENAME.format(collection_name=collection_name)
+    ))
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = BM25Index(path)
+        return _indexes[path]
+
+
+class BM25Index:
+    """In-process inverted index scoring chunks with Okapi BM25.
+
+    Chunks are added and removed by ID as the corpus is ingested, and the
+    index keeps their text and metadata so lexical hits can be returned
+    without a round trip to the vector store.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.RLock()
+        self.documents: Dict[str, str] = {}
+        self.metadatas: Dict[str, Dict] = {}
+        self.lengths: Dict[str, int] = {}
+        # Chunks per language, the sizes of the language partitions
+        self.languages: Counter = Counter()
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.total_length = 0
+        if path is not None and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.add(data["ids"], data["documents"], data["metadatas"])
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, ids: Sequence[str], documents: Sequence[str],
+            metadatas: Sequence[Dict]) -> None:
+        """Index chunks, replacing any chunk with the same ID."""
+        with self.lock:
+            self.remove([doc_id for doc_id in ids if doc_id in self.documents])
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                term_counts = Counter(tokenize(document))
+                for term, count in term_counts.items():
+                    self.postings[term][doc_id] = count
+                length = sum(term_counts.values())
+                self.documents[doc_id] = document
+                self.metadatas[doc_id] = metadata
+                self.lengths[doc_id] = length
+                self.total_length += length
+                self.languages[metadata.get("language")] += 1
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """Remove chunks from the index; unknown IDs are ignored."""
+        with self.lock:
+            for doc_id in ids:
+                document = self.documents.pop(doc_id, None)
+                if document is None:
+                    continue
+                self.languages[self.metadatas.pop(doc_id).get("language")] -= 1
+                self.total_length -= self.lengths.pop(doc_id)
+                for term in set(tokenize(document)):
+                    postings = self.postings.get(term)
+                    if postings is not None:
+                        postings.pop(doc_id, None)
+                        if not postings:
+                            del self.postings[term]
+
+    def clear(self) -> None:
+        """Remove every chunk."""
+        with self.lock:
+            self.documents.clear()
+            self.metadatas.clear()
+            self.lengths.clear()
+            self.languages.clear()
+            self.postings.clear()
+            self.total_length = 0
+
+    def partition_size(self, language: str) -> int:
+        """Number of chunks in a language."""
+        return self.languages[language]
+
+    def search(self, query: str, n_results: int = 10,
+               language: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Return the IDs and BM25 scores of the best matching chunks.
+
+        With a `language`, only chunks in that language are scored.
+        """
+        with self.lock:
+            n_docs = len(self.documents)
+            if n_docs == 0:
+                return []
+            avg_length = self.total_length / n_docs
+            scores: Dict[str, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if language is not None and self.metadatas[doc_id].get("language") != language:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+
+    def save(self) -> None:
+        """Atomically write the indexed chunks to disk; postings are rebuilt on load."""
+        if self.path is None:
+            return
+        with self.lock:
+            ids = list(self.documents)
+            data = {
+                "ids": ids,
+                "documents": [self.documents[doc_id] for doc_id in ids],
+                "metadatas": [self.metadatas[doc_id] for doc_id in ids]
+            }
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
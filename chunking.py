@@ -0,0 +1,126 @@
+import bisect
+import re
+from typing import Dict, List, Tuple
+
+from language import UNDETERMINED, detect_language
+
+# Bump when the splitting rules change, so indexed corpora are re-chunked
+CHUNKER_VERSION = 2
+
+# Numbered headings such as "B. Comment ...", "1) Des innovations ..." or "2.3 Le chômage",
+# and lines opening a chapter or part
+HEADING_LINE = (
+    r"[ \t]*(?:(?:[IVX]{1,4}|[A-H]|\d{1,2}(?:\.\d{1,2})*)[.)][ \t]+[^\n]{3,100}"
+    r"|(?:Chapitre|Partie|Section|Annexe|Introduction|Conclusion)\b[^\n]{0,100})[ \t]*$"
+)
+HEADING = re.compile("^" + HEADING_LINE, re.MULTILINE)
+
+# Page texts are joined with a form feed so page breaks can be told from paragraph breaks
+PAGE_BREAK = "\f"
+
+# Cut points from coarsest to finest: before a heading, at a page break, between
+# paragraphs, between lines, between sentences, between words
+SEPARATORS = [
+    re.compile(r"\n(?=" + HEADING_LINE + ")", re.MULTILINE),
+    re.compile(PAGE_BREAK),
+    re.compile(r"\n[ \t]*\n"),
+    re.compile(r"\n"),
+    re.compile(r"(?<=[.!?;])[ \t]+"),
+    re.compile(r"[ \t]+")
+]
+
+
+def _split(text: str, start: int, end: int, separators: List[re.Pattern],
+           chunk_size: int) -> List[Tuple[int, int]]:
+    """Cut text[start:end] into contiguous spans of at most chunk_size characters.
+
+    Spans are cut at the coarsest separator that occurs, recursing into
+    finer separators only for spans that are still too long.
+    """
+    if end - start <= chunk_size:
+        return [(start, end)]
+    for level, separator in enumerate(separators):
+        cuts = [m.end() for m in separator.finditer(text, start, end) if start < m.end() < end]
+        if not cuts:
+            continue
+        spans = []
+        for span_start, span_end in zip([start] + cuts, cuts + [end]):
+            if span_end - span_start <= chunk_size:
+                spans.append((span_start, span_end))
+            else:
+                spans.extend(_split(text, span_start, span_end, separators[level + 1:], chunk_size))
+        return spans
+    return [(i, min(i + chunk_size, end)) for i in range(start, end, chunk_size)]
+
+
+class PageChunker:
+    """Split a document's pages into overlapping chunks that know where they come from.
+
+    Pages are split like a recursive character splitter, preferring to cut
+    before headings, then at page breaks, paragraphs, lines, sentences and
+    words. A chunk starts afresh at a heading once it is a quarter full, so
+    sections are not glued to the end of the previous one. Each chunk
+    records the pages it spans (numbered from 1), the heading of the
+    section it starts in and its language, that of the whole document when
+    the chunk alone does not tell (e.g. a table of figures).
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 100):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    @property
+    def params(self) -> Dict:
+        """Settings that determine the chunks, recorded in the corpus manifest."""
+        return {"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap,
+                "chunker_version": CHUNKER_VERSION}
+
+    def _merge(self, spans: List[Tuple[int, int]], section_starts: set) -> List[Tuple[int, int]]:
+        """Pack contiguous spans into chunks, carrying up to chunk_overlap characters over."""
+        chunks = []
+        current: List[Tuple[int, int]] = []
+        for span in spans:
+            if current and span[0] in section_starts \
+                    and current[-1][1] - current[0][0] >= self.chunk_size // 4:
+                chunks.append((current[0][0], current[-1][1]))
+                current = []
+            elif current and span[1] - current[0][0] > self.chunk_size:
+                chunks.append((current[0][0], current[-1][1]))
+                while current and (current[-1][1] - current[0][0] > self.chunk_overlap
+                                   or span[1] - current[0][0] > self.chunk_size):
+                    current.pop(0)
+            current.append(span)
+        if current:
+            chunks.append((current[0][0], current[-1][1]))
+        return chunks
+
+    def split_pages(self, pages: List[str]) -> List[Tuple[str, Dict]]:
+        """Return (text, metadata) per chunk, with page_start, page_end, section and language metadata."""
+        text = PAGE_BREAK.join(page.replace(PAGE_BREAK, "\n") for page in pages)
+        page_offsets = []
+        offset = 0
+        for page in pages:
+            page_offsets.append(offset)
+            offset += len(page) + len(PAGE_BREAK)
+
+        headings = [(m.start(), " ".join(m.group(0).split())) for m in HEADING.finditer(text)]
+        heading_starts = [start for start, _ in headings]
+        spans = _split(text, 0, len(text), SEPARATORS, self.chunk_size)
+        document_language = detect_language(text) or UNDETERMINED
+
+        chunks = []
+        for start, end in self._merge(spans, set(heading_starts)):
+            raw = text[start:end]
+            stripped = raw.strip()
+            if not stripped:
+                continue
+            start += len(raw) - len(raw.lstrip())
+            end = start + len(stripped)
+            section = bisect.bisect_right(heading_starts, start) - 1
+            chunks.append((stripped.replace(PAGE_BREAK, "\n"), {
+                "page_start": bisect.bisect_right(page_offsets, start),
+                "page_end": bisect.bisect_right(page_offsets, end - 1),
+                "section": headings[section][1] if section >= 0 else "",
+                "language": detect_language(stripped) or document_language
+            }))
+        return chunks
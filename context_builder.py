@@ -0,0 +1,241 @@
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# Shortest shared suffix/prefix treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+# Longest overlap searched for; above the splitter's 100-character overlap
+MAX_OVERLAP_CHARS = 300
+# Length of the one-line digest kept for turns that no longer fit in full
+SUMMARY_CHARS = 160
+# Last messages of a conversation a SessionMemory matches to resume after them
+SYNC_TAIL = 4
+
+
+def parse_chunk_id(doc_id: str) -> Tuple[str, Optional[int]]:
+    """Split a `<file hash>:<chunk number>` ID; legacy IDs have no chunk number."""
+    file_hash, _, chunk_no = doc_id.rpartition(":")
+    if not file_hash or not chunk_no.isdigit():
+        return doc_id, None
+    return file_hash, int(chunk_no)
+
+
+def merge_overlapping(left: str, right: str) -> Optional[str]:
+    """Join two consecutive chunks, dropping the text they share; None if they don't overlap."""
+    for size in range(min(len(left), len(right), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return None
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text to a token budget, at a sentence or word boundary when possible."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max(max_tokens, 0) * CHARS_PER_TOKEN]
+    for boundary in (". ", "\n", " "):
+        position = cut.rfind(boundary)
+        if position > len(cut) // 2:
+            return cut[:position + 1].rstrip()
+    return cut
+
+
+def summarize_turn(text: str, max_chars: int = SUMMARY_CHARS) -> str:
+    """First sentence of a turn, shortened to a one-line digest."""
+    first = re.split(r"(?<=[.!?])\s", text.strip(), maxsplit=1)[0].replace("\n", " ")
+    return first if len(first) <= max_chars else first[:max_chars - 1].rstrip() + "…"
+
+
+class ContextAssembler:
+    """Build prompt context from retrieval results within a token budget.
+
+    Passages are kept in rank order. Chunks that repeat another are dropped,
+    and neighbouring chunks of the same file are merged into one passage
+    without the text the splitter repeated between them. Passages are then
+    added until the budget is spent, the last one being truncated to fit.
+    """
+
+    def __init__(self, max_tokens: int = 1500, separator: str = "\n\n"):
+        self.max_tokens = max_tokens
+        self.separator = separator
+
+    def _passages(self, results: Dict) -> List[Tuple[str, str]]:
+        """Deduplicated, merged (text, source) passages in rank order."""
+        if not results.get("ids") or not results["ids"][0]:
+            return []
+        rows = list(zip(results["ids"][0], results["documents"][0], results["metadatas"][0]))
+
+        # Group consecutive chunks of the same file, remembering the best rank of each group
+        groups: List[Dict] = []
+        by_file: Dict[str, List[Dict]] = {}
+        seen_texts = set()
+        for rank, (doc_id, document, metadata) in enumerate(rows):
+            if document in seen_texts:
+                continue
+            seen_texts.add(document)
+            file_hash, chunk_no = parse_chunk_id(doc_id)
+            group = None
+            if chunk_no is not None:
+                group = next((g for g in by_file.get(file_hash, [])
+                              if chunk_no in (min(g["chunks"]) - 1, max(g["chunks"]) + 1)), None)
+            if group is None:
+                group = {"rank": rank, "source": metadata.get("source", ""), "chunks": {}}
+                groups.append(group)
+                by_file.setdefault(file_hash, []).append(group)
+            group["chunks"][chunk_no if chunk_no is not None else rank] = document
+
+        passages = []
+        for group in sorted(groups, key=lambda g: g["rank"]):
+            text = ""
+            for _, document in sorted(group["chunks"].items()):
+                merged = merge_overlapping(text, document) if text else None
+                text = merged if merged is not None else (f"{text} {document}" if text else document)
+            passages.append((text, group["source"]))
+
+        # Drop passages fully contained in a higher-ranked one
+        kept: List[Tuple[str, str]] = []
+        for text, source in passages:
+            if not any(text in other for other, _ in kept):
+                kept.append((text, source))
+        return kept
+
+    def assemble(self, results: Dict, max_tokens: Optional[int] = None) -> Tuple[str, List[str]]:
+        """Return the context string and the sources it draws on.
+
+        Args:
+            results: Chroma-shaped query results
+            max_tokens: Budget overriding the assembler's default
+        """
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        separator_tokens = estimate_tokens(self.separator)
+        parts: List[str] = []
+        sources: List[str] = []
+        for text, source in self._passages(results):
+            remaining = budget - sum(estimate_tokens(p) for p in parts) - separator_tokens * len(parts)
+            if remaining <= 0:
+                break
+            text = truncate_to_tokens(text, remaining)
+            if not text:
+                break
+            parts.append(text)
+            if source not in sources:
+                sources.append(source)
+        return self.separator.join(parts), sources
+
+
+def build_history(conversation_history: List[Dict], max_tokens: int = 500) -> str:
+    """Render the conversation within a token budget.
+
+    The most recent turns are kept verbatim. Older turns are reduced to a
+    one-line digest each, and the oldest digests are dropped once the budget
+    is spent, so the rendered history stays bounded however long the session.
+    """
+    lines: List[str] = []
+    used = 0
+    for msg in reversed(conversation_history):
+        prefix = "Q: " if msg["role"] == "user" else "A: "
+        line = prefix + msg["content"]
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            line = prefix + summarize_turn(msg["content"])
+            cost = estimate_tokens(line) + 1
+            if used + cost > max_tokens:
+                break
+        lines.append(line)
+        used += cost
+    return "\n".join(reversed(lines))
+
+
+def extractive_summary(summary: str, turns: List[Dict], max_tokens: int) -> str:
+    """Fold turns into a running summary by appending a digest of each.
+
+    The oldest digests are dropped once the summary exceeds its budget.
+    """
+    lines = summary.splitlines() if summary else []
+    lines.extend(("Q: " if msg["role"] == "user" else "A: ") + summarize_turn(msg["content"])
+                 for msg in turns)
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return truncate_to_tokens("\n".join(lines), max_tokens)
+
+
+class SessionMemory:
+    """Rolling memory of one conversation, rendered within a fixed token budget.
+
+    Recent turns are kept verbatim. Once they outgrow their share of the
+    budget, the oldest of them are folded into a running summary by the
+    `summarize(summary, turns, max_tokens)` function, and the turns after
+    them stay verbatim. Each message is summarized at most once, so both the
+    rendered memory and the work per turn stay flat however long the session.
+    """
+
+    def __init__(self, max_tokens: int = 500, summary_tokens: Optional[int] = None,
+                 summarize: Optional[Callable[[str, List[Dict], int], str]] = None):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens if summary_tokens is not None else max_tokens // 3
+        self.summarize = summarize or extractive_summary
+        self.summary = ""
+        self.turns: List[Dict] = []
+        # Messages taken in so far, and the last few of them to find our place
+        # in a conversation whose oldest messages the session store dropped
+        self.n_messages = 0
+        self._tail: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+
+    def sync(self, messages: List[Dict]) -> "SessionMemory":
+        """Take in the messages of the conversation not seen yet.
+
+        `messages` is the conversation so far, possibly without its oldest
+        messages. The new ones are those after the last messages already
+        seen; a conversation that does not contain them (e.g. after clearing
+        it) starts over.
+        """
+        with self._lock:
+            start = self._resume_at(messages)
+            if start is None:
+                self.summary, self.turns, self._tail = "", [], []
+                start = 0
+            new = messages[start:]
+            if new:
+                self.turns.extend({"role": msg["role"], "content": msg["content"]} for msg in new)
+                self.n_messages += len(new)
+                self._tail = [(msg["role"], msg["content"]) for msg in messages[-SYNC_TAIL:]]
+                self._compact()
+        return self
+
+    def _resume_at(self, messages: List[Dict]) -> Optional[int]:
+        """Index of the first unseen message, or None if the seen ones are not there."""
+        if not self._tail:
+            return 0
+        keys = [(msg["role"], msg["content"]) for msg in messages]
+        width = len(self._tail)
+        for end in range(len(keys), width - 1, -1):
+            if keys[end - width:end] == self._tail:
+                return end
+        return None
+
+    def _turn_tokens(self) -> int:
+        return sum(estimate_tokens(msg["content"]) + 1 for msg in self.turns)
+
+    def _compact(self) -> None:
+        budget = self.max_tokens - self.summary_tokens
+        if self._turn_tokens() <= budget or len(self.turns) < 2:
+            return
+        # Fold down to half the budget so summarization runs every few turns, not every turn
+        folded = []
+        while len(self.turns) > 1 and self._turn_tokens() > budget // 2:
+            folded.append(self.turns.pop(0))
+        self.summary = self.summarize(self.summary, folded, self.summary_tokens)
+
+    def render(self) -> str:
+        """The summary and the recent turns, within `max_tokens`."""
+        with self._lock:
+            parts = []
+            if self.summary:
+                parts.append(f"Summary of earlier turns:\n{self.summary}")
+            if self.turns:
+                budget = self.max_tokens - estimate_tokens(parts[0] if parts else "")
+                parts.append(build_history(self.turns, budget))
+            return "\n".join(parts)
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MANIFEST_FILENAME = "corpus_manifest.json"
+
+_manifests: Dict[str, "CorpusManifest"] = {}
+_manifests_lock = threading.Lock()
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(file_hash: str, chunk_no: int) -> str:
+    """Deterministic ID of a chunk: `<file hash>:<chunk number>`."""
+    return f"{file_hash}:{chunk_no}"
+
+
+def chunk_ids(file_hash: str, n_chunks: int) -> List[str]:
+    """IDs of all chunks of a file."""
+    return [chunk_id(file_hash, i) for i in range(n_chunks)]
+
+
+def load_manifest(persist_directory: str) -> "CorpusManifest":
+    """Return the process-wide manifest stored in the given directory."""
+    path = os.path.abspath(os.path.join(persist_directory, MANIFEST_FILENAME))
+    with _manifests_lock:
+        if path not in _manifests:
+            _manifests[path] = CorpusManifest(path)
+        return _manifests[path]
+
+
+class CorpusManifest:
+    """Persisted record of indexed files, keyed by absolute path.
+
+    Each entry stores the content hash, mtime and size of the file and the
+    number of chunks written for it, which is enough to rebuild every chunk
+    ID and to detect new, changed and deleted files without re-reading them.
+    The chunking settings the files were split with are recorded alongside.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.entries: Dict[str, Dict] = {}
+        self.chunking: Optional[Dict] = None
+        # (generation, version); mutations bump the generation so readers never
+        # need the lock, which ingestion holds while a file is being indexed
+        self._generation = 0
+        self._version: Tuple[int, Optional[str]] = (-1, None)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data.get("files", {})
+            self.chunking = data.get("chunking")
+
+    def save(self) -> None:
+        """Atomically write the manifest to disk."""
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"files": self.entries, "chunking": self.chunking},
+                          f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        """Forget every indexed file."""
+        with self.lock:
+            self.entries = {}
+            self._generation += 1
+            self.save()
+
+    @property
+    def version(self) -> str:
+        """Identifier of the indexed content; changes whenever the corpus changes."""
+        generation, version = self._version
+        if generation == self._generation:
+            return version
+        generation = self._generation
+        hashes = sorted(entry["hash"] for entry in list(self.entries.values()))
+        hashes.append(json.dumps(self.chunking, sort_keys=True))
+        version = hashlib.sha256("\n".join(hashes).encode("utf-8")).hexdigest()[:16]
+        self._version = (generation, version)
+        return version
+
+    def set_chunking(self, chunking: Dict) -> None:
+        """Record the chunking settings the indexed files are split with."""
+        with self.lock:
+            self.chunking = dict(chunking)
+            self._generation += 1
+
+    @staticmethod
+    def key(path: str) -> str:
+        """Manifest key of a file."""
+        return os.path.abspath(path)
+
+    def get(self, path: str) -> Optional[Dict]:
+        """Entry recorded for a file, if any."""
+        return self.entries.get(self.key(path))
+
+    def record(self, path: str, file_hash: str, n_chunks: int) -> None:
+        """Record a file as indexed with the given hash and chunk count."""
+        stat = os.stat(path)
+        with self.lock:
+            self.entries[self.key(path)] = {
+                "hash": file_hash,
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "chunks": n_chunks
+            }
+            self._generation += 1
+
+    def remove(self, key: str) -> Optional[Dict]:
+        """Drop an entry and return it."""
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            self._generation += 1
+            return entry
+
+    def is_hash_indexed(self, file_hash: str, exclude: Optional[str] = None) -> bool:
+        """Whether any other file with this content hash is already indexed."""
+        return any(entry["hash"] == file_hash
+                   for key, entry in list(self.entries.items()) if key != exclude)
+
+    def plan(self, pdf_paths: Iterable[str],
+             prune_directory: Optional[str] = None) -> Tuple[Dict[str, str], List[str], List[str]]:
+        """Compare files on disk against the manifest.
+
+        Args:
+            pdf_paths: Files that should be in the corpus
+            prune_directory: If given, indexed files inside this directory that
+                are not in `pdf_paths` are reported as deleted
+
+        Returns:
+            Tuple of ({path: hash} to (re)index, manifest keys that changed or
+            were deleted, paths that are unchanged)
+        """
+        to_index: Dict[str, str] = {}
+        stale: List[str] = []
+        unchanged: List[str] = []
+        seen = set()
+
+        with self.lock:
+            for path in pdf_paths:
+                key = self.key(path)
+                seen.add(key)
+                entry = self.entries.get(key)
+                stat = os.stat(path)
+                if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                    unchanged.append(path)
+                    continue
+
+                file_hash = file_sha256(path)
+                if entry and entry["hash"] == file_hash:
+                    # Touched but identical content: refresh mtime only
+                    self.record(path, file_hash, entry["chunks"])
+                    unchanged.append(path)
+                    continue
+
+                if entry:
+                    stale.append(key)
+                to_index[path] = file_hash
+
+            if prune_directory is not None:
+                directory = os.path.abspath(prune_directory) + os.sep
+                stale.extend(key for key in self.entries
+                             if key.startswith(directory) and key not in seen)
+
+        return to_index, stale, unchanged
@@ -0,0 +1,156 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from benchmark import CANNED_ANSWER, CANNED_QUIZ
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """Local stand-in for the Anthropic `/v1/complete` endpoint.
+
+    Answers tutoring prompts with a canned answer and quiz prompts with a
+    canned quiz, at a configurable speed, and injects the failures the LLM
+    client has to survive: overload and rate-limit errors with a retry-after
+    header, and slow responses making up the latency tail.
+
+    Args:
+        latency_s: Time to first token
+        tokens_per_s: Generation speed after the first token
+        error_rate: Fraction of requests answered with a 529, or a 429 when
+            `rate_limit` is set
+        slow_rate: Fraction of requests delayed by an extra `slow_s` seconds
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency_s: float = 0.2, tokens_per_s: float = 200.0,
+                 error_rate: float = 0.0, slow_rate: float = 0.0, slow_s: float = 2.0,
+                 rate_limit: bool = False, retry_after_s: float = 0.1, seed: Optional[int] = None):
+        super().__init__(address, FakeLLMRequestHandler)
+        self.latency_s = latency_s
+        self.tokens_per_s = tokens_per_s
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_s = slow_s
+        self.rate_limit = rate_limit
+        self.retry_after_s = retry_after_s
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "slow": 0, "streams": 0}
+        self._lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients drop the connection of the losing request of a hedged pair
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def draw(self) -> Tuple[bool, bool]:
+        """Decide whether the next request fails and whether it is slow."""
+        with self._lock:
+            self.stats["requests"] += 1
+            failed = self.random.random() < self.error_rate
+            slow = not failed and self.random.random() < self.slow_rate
+            if failed:
+                self.stats["errors"] += 1
+            if slow:
+                self.stats["slow"] += 1
+            return failed, slow
+
+
+class FakeLLMRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeLLMServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != "/v1/complete":
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error",
+                                                             "message": self.path}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        server = self.server
+        failed, slow = server.draw()
+        if failed:
+            status, kind = (429, "rate_limit_error") if server.rate_limit else (529, "overloaded_error")
+            self._send_json(status, {"type": "error", "error": {"type": kind, "message": kind}},
+                            {"retry-after": str(server.retry_after_s)})
+            return
+
+        text = json.dumps(CANNED_QUIZ) if "quiz" in request["prompt"][:400].lower() else CANNED_ANSWER
+        tokens = [text[i:i + 4] for i in range(0, len(text), 4)][:request["max_tokens_to_sample"]]
+        time.sleep(server.latency_s + (server.slow_s if slow else 0))
+        if not request.get("stream"):
+            time.sleep(len(tokens) / server.tokens_per_s)
+            self._send_json(200, {"type": "completion", "id": "compl_fake", "model": request["model"],
+                                  "completion": "".join(tokens), "stop_reason": "stop_sequence"})
+            return
+
+        with server._lock:
+            server.stats["streams"] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events = [{"type": "completion", "completion": token, "stop_reason": None} for token in tokens]
+        events.append({"type": "completion", "completion": "", "stop_reason": "stop_sequence"})
+        for event in events:
+            time.sleep(1 / server.tokens_per_s)
+            data = f"event: completion\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_fake_server(host: str = "127.0.0.1", port: int = 0, **options) -> FakeLLMServer:
+    """Run a fake LLM server on a background thread; its address is `server.url`."""
+    server = FakeLLMServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="fake-llm", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Anthropic completions endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-s", type=float, default=2.0)
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="Fail with 429 rate limits instead of 529 overloads")
+    args = parser.parse_args()
+    server = FakeLLMServer((args.host, args.port), latency_s=args.latency,
+                           tokens_per_s=args.tokens_per_s, error_rate=args.error_rate,
+                           slow_rate=args.slow_rate, slow_s=args.slow_s, rate_limit=args.rate_limit)
+    print(f"Fake LLM server on {server.url}; run the tutor with TUTOR_LLM_BASE_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,16 @@ import streamlit as st
 import os
 import tempfile
 import json
+import hashlib
+import uuid
 from AI_tutor import EconomicsTutor
+from ingestion_jobs import load_job_queue
+from tutor_client import TutorClient
 from datetime import datetime
 
+# When set, the tutor runs in tutor_server.py and this script is only its UI
+TUTOR_API_URL = os.getenv("TUTOR_API_URL")
+
 # Initialize session states
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -16,8 +23,22 @@ if "current_quiz" not in st.session_state:
     st.session_state.current_quiz = None
 if "quiz_answers" not in st.session_state:
     st.session_state.quiz_answers = {}
+if "session_id" not in st.session_state:
+    # Lets the tutor update this conversation's memory incrementally
+    st.session_state.session_id = uuid.uuid4().hex
+if "upload_jobs" not in st.session_state:
+    # Content hash -> ingestion job ID, so reruns never resubmit an upload
+    st.session_state.upload_jobs = {}
 if "tutor" not in st.session_state:
-    st.session_state.tutor = EconomicsTutor()
+    if TUTOR_API_URL:
+        # The session ID is kept in the URL, so a reload or a UI restart resumes the conversation
+        st.session_state.tutor = TutorClient(TUTOR_API_URL, session_id=st.query_params.get("session"))
+        st.query_params["session"] = st.session_state.tutor.ensure_session(st.session_state.language)
+        st.session_state.messages = st.session_state.tutor.messages()
+    else:
+        st.session_state.tutor = EconomicsTutor()
+        st.session_state.tutor.warm_up()
+        st.session_state.tutor.prefill_quiz_bank()
 
 def display_interactive_quiz():
     """Display the interactive quiz with visual feedback"""
@@ -80,6 +101,47 @@ def display_interactive_quiz():
             st.session_state.show_quiz = False
             st.rerun()
 
+def submit_upload(file) -> dict:
+    """Queue an uploaded PDF for background indexing and return its job."""
+    if TUTOR_API_URL:
+        return st.session_state.tutor.upload_document(file.name, file.getvalue())
+    return load_job_queue(st.session_state.tutor).submit(file.name, file.getvalue()).to_dict()
+
+def upload_job(job_id: str, cancel: bool = False):
+    """Current state of an ingestion job, cancelling it first if asked."""
+    if TUTOR_API_URL:
+        tutor = st.session_state.tutor
+        return tutor.cancel_job(job_id) if cancel else tutor.job(job_id)
+    jobs = load_job_queue(st.session_state.tutor)
+    job = jobs.cancel(job_id) if cancel else jobs.get(job_id)
+    return None if job is None else job.to_dict()
+
+def display_upload_jobs():
+    """Status and progress of the uploads of this session."""
+    labels = {"queued": "⏳ En attente", "running": "⚙️ Indexation", "done": "✅ Ajouté",
+              "failed": "❌ Erreur", "cancelled": "🚫 Annulé"}
+    for file_hash, job_id in list(st.session_state.upload_jobs.items()):
+        try:
+            job = upload_job(job_id)
+        except Exception as e:
+            st.error(f"❌ Erreur: {str(e)}")
+            continue
+        if job is None:
+            del st.session_state.upload_jobs[file_hash]
+            continue
+        st.caption(f"{labels[job['status']]} : {job['filename']}")
+        if job["status"] == "running":
+            st.progress(job["progress"], text=f"{job['chunks_indexed']}/{job['chunks_total']} "
+                                              f"passages, {job['pages_per_s']:.1f} pages/s")
+        if job["status"] in ("queued", "running"):
+            if st.button("Annuler", key=f"cancel_{job_id}", use_container_width=True):
+                upload_job(job_id, cancel=True)
+                st.rerun()
+        elif job["status"] == "failed":
+            st.error(job["error"])
+    if st.session_state.upload_jobs:
+        st.button("Actualiser", key="refresh_jobs", use_container_width=True)
+
 def main():
     st.set_page_config(page_title="Assistant Économique", page_icon="📚", layout="wide")
 
@@ -104,17 +166,15 @@ def main():
 
         if uploaded_files:
             for file in uploaded_files:
-                with st.spinner(f"Traitement de {file.name}..."):
-                    try:
-                        if not os.path.exists(st.session_state.tutor.INITIAL_CORPUS_DIR):
-                            os.makedirs(st.session_state.tutor.INITIAL_CORPUS_DIR)
-                        file_path = os.path.join(st.session_state.tutor.INITIAL_CORPUS_DIR, file.name)
-                        with open(file_path, "wb") as f:
-                            f.write(file.getvalue())
-                        st.session_state.tutor.add_document_to_corpus(file_path)
-                        st.success(f"✅ {file.name} ajouté")
-                    except Exception as e:
-                        st.error(f"❌ Erreur: {str(e)}")
+                file_hash = hashlib.sha256(file.getvalue()).hexdigest()
+                if file_hash in st.session_state.upload_jobs:
+                    continue
+                try:
+                    st.session_state.upload_jobs[file_hash] = submit_upload(file)["job_id"]
+                except Exception as e:
+                    st.error(f"❌ Erreur: {str(e)}")
+
+        display_upload_jobs()
 
         st.header("Langue / Language")
         language = st.selectbox(
@@ -147,12 +207,15 @@ def main():
                     st.markdown(prompt)
 
                 with st.chat_message("assistant"):
-                    with st.spinner("Réflexion en cours..."):
-                        response = st.session_state.tutor.handle_question(
+                    # Render the answer token by token as Claude produces it
+                    response = st.write_stream(
+                        st.session_state.tutor.handle_question_stream(
                             prompt, 
-                            st.session_state.language
+                            st.session_state.language,
+                            conversation_history=st.session_state.messages[:-1],
+                            session_id=st.session_state.session_id
                         )
-                    st.markdown(response)
+                    )
                     st.session_state.messages.append({"role": "assistant", "content": response})
 
         # Quiz and Clear buttons with consistent styling
@@ -165,6 +228,8 @@ def main():
         with button_col2:
             if st.button("Effacer la conversation", key="clear_chat", use_container_width=True):
                 st.session_state.messages = []
+                if TUTOR_API_URL:
+                    st.session_state.tutor.clear_history()
                 st.rerun()
 
     else:  # Quiz Interface
@@ -180,7 +245,8 @@ def main():
                         quiz = st.session_state.tutor.generate_quiz(
                             conversation_history=st.session_state.messages,
                             topic=topic,
-                            language=st.session_state.language
+                            language=st.session_state.language,
+                            session_id=st.session_state.session_id
                         )
                         try:
                             test_parse = json.loads(quiz)
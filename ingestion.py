@@ -0,0 +1,264 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from chunking import PageChunker
+from corpus_manifest import chunk_id, file_sha256
+
+# Pages handed to a worker in one task; keeps per-task overhead low on long PDFs
+PAGES_PER_TASK = 16
+# Page-range tasks submitted per worker at a time; more are submitted as results are consumed
+TASKS_IN_FLIGHT_PER_WORKER = 2
+# Chunks embedded and written to the vector store per call
+DEFAULT_BATCH_SIZE = 64
+# Maximum number of chunks buffered between the splitter and the writer
+DEFAULT_QUEUE_SIZE = 512
+
+_SENTINEL = None
+
+
+class IngestionCancelled(Exception):
+    """Raised by IngestionPipeline.run when its cancel event is set."""
+
+
+def count_pages(pdf_path: str) -> int:
+    """Return the number of pages in a PDF."""
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(pdf_path).pages)
+
+
+def extract_page_range(pdf_path: str, start: int, stop: int) -> Tuple[str, int, List[str]]:
+    """Extract the text of pages [start, stop) of a PDF.
+
+    Runs inside a worker process, so it only takes picklable arguments.
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(pdf_path)
+    pages = [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+    return pdf_path, start, pages
+
+
+class IngestionPipeline:
+    """Staged PDF ingestion: parallel extraction, streamed chunking, batched writes.
+
+    Page extraction runs in a process pool across files and pages. Chunks of
+    each completed file are pushed through a bounded queue to a single writer
+    thread, which embeds and stores them in fixed-size batches so that peak
+    memory does not grow with the size of the corpus. When a lexical index is
+    given, each batch is added to it as well. When a page cache is given,
+    files whose text is cached skip extraction, and extracted text is cached.
+    """
+
+    def __init__(self, collection, chunk_size: int = 1000, chunk_overlap: int = 100,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_workers: Optional[int] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 lexical_index=None,
+                 page_cache=None):
+        self.collection = collection
+        self.lexical_index = lexical_index
+        self.page_cache = page_cache
+        self.batch_size = batch_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.chunker = PageChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    def run(self, pdf_paths: Iterable[str],
+            file_hashes: Optional[Dict[str, str]] = None,
+            progress: Optional[Callable[[Dict], None]] = None,
+            cancel: Optional[threading.Event] = None) -> Dict:
+        """Ingest the given PDFs and return throughput statistics.
+
+        Args:
+            pdf_paths: PDF files to index
+            file_hashes: Content hashes of the files, computed when missing;
+                chunk IDs are `<hash>:<chunk_no>` so re-ingesting a file
+                overwrites its chunks instead of duplicating them
+            progress: Called with the running statistics after each file is
+                split and after each batch is stored
+            cancel: When set, ingestion stops, the chunks written so far are
+                deleted and IngestionCancelled is raised
+
+        Returns:
+            Dict with files, pages, pages read from the page cache, chunks,
+            seconds and the number of chunks written per file under
+            `chunks_by_file`
+        """
+        pdf_paths = list(pdf_paths)
+        file_hashes = dict(file_hashes or {})
+        for pdf_path in pdf_paths:
+            if pdf_path not in file_hashes:
+                file_hashes[pdf_path] = file_sha256(pdf_path)
+        stats = {"files": 0, "pages": 0, "pages_cached": 0, "chunks": 0, "seconds": 0.0,
+                 "chunks_by_file": {}}
+        if not pdf_paths:
+            return stats
+
+        started = time.perf_counter()
+        chunk_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        writer_errors: List[BaseException] = []
+        written: List[str] = []
+        writer = threading.Thread(
+            target=self._write_batches,
+            args=(chunk_queue, stats, writer_errors, written, progress, cancel),
+            daemon=True
+        )
+        writer.start()
+
+        try:
+            for pdf_path, pages in self._pages(pdf_paths, file_hashes, stats):
+                if writer_errors or (cancel is not None and cancel.is_set()):
+                    break
+                stats["files"] += 1
+                stats["pages"] += len(pages)
+                stats["chunks_by_file"][pdf_path] = self._enqueue_chunks(
+                    pdf_path, file_hashes[pdf_path], pages, chunk_queue
+                )
+                print(f"Added {pdf_path} to corpus")
+                if progress is not None:
+                    progress(stats)
+        finally:
+            chunk_queue.put(_SENTINEL)
+            writer.join()
+
+        if writer_errors:
+            raise writer_errors[0]
+        if cancel is not None and cancel.is_set():
+            if written:
+                self.collection.delete(ids=written)
+                if self.lexical_index is not None:
+                    self.lexical_index.remove(written)
+            raise IngestionCancelled(f"Ingestion cancelled, removed {len(written)} chunks")
+
+        stats["seconds"] = time.perf_counter() - started
+        return stats
+
+    def _pages(self, pdf_paths: List[str], file_hashes: Dict[str, str],
+               stats: Dict) -> Iterable[Tuple[str, List[str]]]:
+        """Yield (path, page_texts) for each PDF, from the page cache when possible."""
+        to_extract = []
+        for pdf_path in pdf_paths:
+            pages = self.page_cache.get(file_hashes[pdf_path]) if self.page_cache is not None else None
+            if pages is None:
+                to_extract.append(pdf_path)
+                continue
+            stats["pages_cached"] += len(pages)
+            yield pdf_path, pages
+
+        for pdf_path, pages in self._extract(to_extract):
+            if self.page_cache is not None:
+                self.page_cache.put(file_hashes[pdf_path], pages)
+            yield pdf_path, pages
+
+    def _extract(self, pdf_paths: List[str]) -> Iterable[Tuple[str, List[str]]]:
+        """Yield (path, page_texts) for each PDF as soon as all its pages are extracted."""
+        if not pdf_paths:
+            return
+        if self.max_workers == 1:
+            for pdf_path in pdf_paths:
+                yield pdf_path, extract_page_range(pdf_path, 0, count_pages(pdf_path))[2]
+            return
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            page_counts = dict(zip(pdf_paths, pool.map(count_pages, pdf_paths)))
+
+            pending: Dict[str, Dict[int, List[str]]] = {path: {} for path in pdf_paths}
+            remaining: Dict[str, int] = {}
+            tasks = []
+            for pdf_path, n_pages in page_counts.items():
+                ranges = [(start, min(start + PAGES_PER_TASK, n_pages))
+                          for start in range(0, n_pages, PAGES_PER_TASK)]
+                remaining[pdf_path] = len(ranges)
+                if not ranges:
+                    yield pdf_path, []
+                    continue
+                tasks.extend((pdf_path, start, stop) for start, stop in ranges)
+
+            # Only a few tasks per worker are queued at once, so a large upload
+            # does not hold a future per page range nor run far ahead of the caller
+            tasks = iter(tasks)
+            max_in_flight = self.max_workers * TASKS_IN_FLIGHT_PER_WORKER
+            in_flight = set()
+            try:
+                while True:
+                    for task in tasks:
+                        in_flight.add(pool.submit(extract_page_range, *task))
+                        if len(in_flight) >= max_in_flight:
+                            break
+                    if not in_flight:
+                        break
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pdf_path, start, pages = future.result()
+                        pending[pdf_path][start] = pages
+                        remaining[pdf_path] -= 1
+                        if remaining[pdf_path] == 0:
+                            parts = pending.pop(pdf_path)
+                            yield pdf_path, [text for start in sorted(parts) for text in parts[start]]
+            finally:
+                # Don't wait for pages nobody will read when the caller stops early
+                for future in in_flight:
+                    future.cancel()
+
+    def _enqueue_chunks(self, pdf_path: str, file_hash: str, pages: List[str],
+                        chunk_queue: "queue.Queue") -> int:
+        """Split a document, stream its chunks to the writer and return their count.
+
+        Chunk metadata holds the source file, the pages the chunk spans, its
+        section heading and its language; `page` is the first page, numbered
+        from 1.
+        """
+        chunks = self.chunker.split_pages(pages)
+        source = os.path.basename(pdf_path)
+        for i, (chunk, location) in enumerate(chunks):
+            metadata = {"source": source, "page": location["page_start"], **location}
+            chunk_queue.put((chunk_id(file_hash, i), chunk, metadata))
+        return len(chunks)
+
+    def _write_batches(self, chunk_queue: "queue.Queue", stats: Dict,
+                       errors: List[BaseException], written: List[str],
+                       progress: Optional[Callable[[Dict], None]] = None,
+                       cancel: Optional[threading.Event] = None) -> None:
+        """Drain the queue, embedding and storing chunks in fixed-size batches."""
+        ids: List[str] = []
+        documents: List[str] = []
+        metadatas: List[Dict] = []
+
+        def flush():
+            if not documents or (cancel is not None and cancel.is_set()):
+                return
+            self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas)
+            if self.lexical_index is not None:
+                self.lexical_index.add(ids, documents, metadatas)
+            written.extend(ids)
+            stats["chunks"] += len(documents)
+            if progress is not None:
+                progress(stats)
+            ids.clear()
+            documents.clear()
+            metadatas.clear()
+
+        while True:
+            item = chunk_queue.get()
+            if item is _SENTINEL:
+                break
+            if errors or (cancel is not None and cancel.is_set()):
+                continue  # keep draining so the producer never blocks
+            ids.append(item[0])
+            documents.append(item[1])
+            metadatas.append(item[2])
+            if len(documents) >= self.batch_size:
+                try:
+                    flush()
+                except Exception as e:
+                    errors.append(e)
+        if not errors:
+            try:
+                flush()
+            except Exception as e:
+                errors.append(e)
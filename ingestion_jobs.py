@@ -0,0 +1,225 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ingestion import IngestionCancelled, count_pages
+
+# Finished jobs remembered for status queries
+MAX_FINISHED_JOBS = 100
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_queues: Dict[Tuple[str, str], "IngestionJobQueue"] = {}
+_queues_lock = threading.Lock()
+
+
+def load_job_queue(tutor, workers: int = 1) -> "IngestionJobQueue":
+    """Return the process-wide job queue feeding the tutor's collection."""
+    key = (os.path.abspath(tutor.PERSIST_DIRECTORY), tutor.COLLECTION_NAME)
+    with _queues_lock:
+        if key not in _queues:
+            _queues[key] = IngestionJobQueue(tutor, workers=workers)
+        return _queues[key]
+
+
+class IngestionJob:
+    """Status and progress of one uploaded PDF."""
+
+    def __init__(self, filename: str, file_hash: str, pdf_path: str):
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.file_hash = file_hash
+        self.pdf_path = pdf_path
+        self.status = "queued"
+        self.duplicate = False
+        self.pages = 0
+        self.chunks_total = 0
+        self.chunks_indexed = 0
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def seconds(self) -> float:
+        """Time spent indexing so far."""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self) -> Dict:
+        seconds = self.seconds
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "file_hash": self.file_hash,
+            "status": self.status,
+            "duplicate": self.duplicate,
+            "pages": self.pages,
+            "chunks_indexed": self.chunks_indexed,
+            "chunks_total": self.chunks_total,
+            "progress": self.chunks_indexed / self.chunks_total if self.chunks_total else
+                        float(self.status == "done"),
+            "error": self.error,
+            "queued_seconds": (self.started_at or time.time()) - self.submitted_at,
+            "seconds": seconds,
+            "pages_per_s": self.pages / seconds if seconds > 0 else 0.0,
+            "chunks_per_s": self.chunks_indexed / seconds if seconds > 0 else 0.0
+        }
+
+
+class IngestionJobQueue:
+    """Indexes uploaded PDFs on background threads.
+
+    Uploads are deduplicated by content hash: a file that is already indexed,
+    queued or being indexed returns the existing job instead of a new one, so
+    resubmitting the same upload is free. Jobs report pages and chunks as the
+    pipeline stores them, and can be cancelled while queued or running; a
+    cancelled job leaves neither chunks nor its file behind.
+    """
+
+    def __init__(self, tutor, workers: int = 1, max_finished: int = MAX_FINISHED_JOBS):
+        self.tutor = tutor
+        self.max_finished = max_finished
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._by_hash: Dict[str, IngestionJob] = {}
+        self._queue: "queue.Queue[IngestionJob]" = queue.Queue()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"ingestion-job-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, filename: str, content: bytes) -> IngestionJob:
+        """Save an uploaded PDF to the corpus directory and queue it for indexing."""
+        filename = os.path.basename(filename)
+        file_hash = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            existing = self._existing(file_hash)
+            if existing is not None:
+                return existing
+            pdf_path = os.path.join(self.tutor.INITIAL_CORPUS_DIR, filename)
+            os.makedirs(self.tutor.INITIAL_CORPUS_DIR, exist_ok=True)
+            with open(pdf_path, "wb") as f:
+                f.write(content)
+            return self._enqueue(IngestionJob(filename, file_hash, pdf_path))
+
+    def submit_path(self, pdf_path: str) -> IngestionJob:
+        """Queue a PDF already on disk for indexing."""
+        with open(pdf_path, "rb") as f:
+            file_hash = hashlib.sha256(f.read()).hexdigest()
+        with self._lock:
+            existing = self._existing(file_hash)
+            if existing is not None:
+                return existing
+            return self._enqueue(IngestionJob(os.path.basename(pdf_path), file_hash, pdf_path))
+
+    def _existing(self, file_hash: str) -> Optional[IngestionJob]:
+        """Job already covering this content; records one if it is indexed.
+
+        A finished job only counts while its content is still indexed, so a
+        file deleted from the corpus can be uploaded again.
+        """
+        indexed = self.tutor.manifest.is_hash_indexed(file_hash)
+        job = self._by_hash.get(file_hash)
+        if job is not None and (job.status in ACTIVE_STATUSES or job.status == "done" and indexed):
+            return job
+        if job is not None:
+            del self._by_hash[file_hash]
+        if indexed:
+            job = IngestionJob("", file_hash, "")
+            for key, entry in list(self.tutor.manifest.entries.items()):
+                if entry["hash"] == file_hash:
+                    job.filename, job.pdf_path = os.path.basename(key), key
+                    job.chunks_total = job.chunks_indexed = entry["chunks"]
+                    break
+            job.status = "done"
+            job.duplicate = True
+            job.started_at = job.finished_at = job.submitted_at
+            self._remember(job)
+            return job
+        return None
+
+    def _enqueue(self, job: IngestionJob) -> IngestionJob:
+        self._remember(job)
+        self._queue.put(job)
+        return job
+
+    def _remember(self, job: IngestionJob) -> None:
+        self._jobs[job.job_id] = job
+        self._by_hash[job.file_hash] = job
+        finished = [job_id for job_id, old in self._jobs.items() if old.status not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            old = self._jobs.pop(job_id)
+            if self._by_hash.get(old.file_hash) is old:
+                del self._by_hash[old.file_hash]
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[IngestionJob]:
+        """Known jobs, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[IngestionJob]:
+        """Cancel a queued or running job; finished jobs are left as they are."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ACTIVE_STATUSES:
+                return job
+            job.cancel_event.set()
+            if job.status == "queued":
+                self._finish(job, "cancelled")
+        return job
+
+    def _finish(self, job: IngestionJob, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        if status == "cancelled" and job.pdf_path and os.path.exists(job.pdf_path):
+            os.remove(job.pdf_path)
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.cancel_event.is_set():
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+            try:
+                self._run(job)
+            except IngestionCancelled:
+                with self._lock:
+                    self._finish(job, "cancelled")
+            except Exception as e:
+                with self._lock:
+                    self._finish(job, "failed", str(e))
+            else:
+                with self._lock:
+                    self._finish(job, "done")
+            print(f"Ingestion job {job.job_id} ({job.filename}) {job.status} "
+                  f"in {job.seconds:.1f}s")
+
+    def _run(self, job: IngestionJob) -> None:
+        job.pages = count_pages(job.pdf_path)
+
+        def progress(stats: Dict) -> None:
+            job.chunks_total = sum(stats["chunks_by_file"].values())
+            job.chunks_indexed = stats["chunks"]
+
+        self.tutor.add_document_to_corpus(job.pdf_path, progress=progress,
+                                          cancel=job.cancel_event)
+        entry = self.tutor.manifest.get(job.pdf_path)
+        if entry is not None:
+            job.chunks_total = job.chunks_indexed = entry["chunks"]
@@ -0,0 +1,217 @@
+import asyncio
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _NullSpan:
+    """No-op span handed out when instrumentation is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, instrumentation: "Instrumentation", name: str, attrs: Dict):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.instrumentation.record(self.name, duration, self.attrs)
+        return False
+
+
+class Instrumentation:
+    """Span timers and counters fanned out to pluggable exporters.
+
+    Exporters are objects with `on_span(name, duration_s, attrs)` and
+    `on_counter(name, value)` methods. When disabled, `span` returns a shared
+    no-op context manager and `incr` returns immediately, so instrumented
+    code pays almost nothing.
+    """
+
+    def __init__(self, exporters: Optional[List] = None, enabled: Optional[bool] = None):
+        self.exporters = list(exporters or [])
+        self.enabled = bool(self.exporters) if enabled is None else enabled
+
+    def add_exporter(self, exporter) -> None:
+        """Register an exporter and enable instrumentation."""
+        self.exporters.append(exporter)
+        self.enabled = True
+
+    def span(self, name: str, **attrs):
+        """Context manager timing a stage."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, attrs)
+
+    def record(self, name: str, duration_s: float, attrs: Optional[Dict] = None) -> None:
+        """Report a stage duration measured elsewhere."""
+        if not self.enabled:
+            return
+        for exporter in self.exporters:
+            exporter.on_span(name, duration_s, attrs or {})
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increase a counter."""
+        if not self.enabled:
+            return
+        for exporter in self.exporters:
+            exporter.on_counter(name, value)
+
+
+def traced(stage: str):
+    """Decorator timing a method or coroutine method in a span, using the instance's `instrumentation`."""
+    def decorator(method):
+        if asyncio.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                with self.instrumentation.span(stage):
+                    return await method(self, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.instrumentation.span(stage):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class InMemoryHistogramExporter:
+    """Keeps a latency histogram per span name and a total per counter."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, Dict] = {}
+        self.counters: Dict[str, float] = {}
+
+    def on_span(self, name: str, duration_s: float, attrs: Dict) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = {
+                    "counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0, "max": 0.0
+                }
+            histogram["counts"][bisect.bisect_left(self.buckets, duration_s)] += 1
+            histogram["sum"] += duration_s
+            histogram["count"] += 1
+            histogram["max"] = max(histogram["max"], duration_s)
+
+    def on_counter(self, name: str, value: float) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _quantile(self, histogram: Dict, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile."""
+        target = q * histogram["count"]
+        seen = 0
+        for bound, count in zip(self.buckets, histogram["counts"]):
+            seen += count
+            if seen >= target:
+                return bound
+        return histogram["max"]
+
+    def snapshot(self) -> Dict:
+        """Per-stage count, mean, p50, p99 and max, and counter totals."""
+        with self._lock:
+            stages = {
+                name: {
+                    "count": h["count"],
+                    "mean_s": h["sum"] / h["count"] if h["count"] else 0.0,
+                    "p50_s": self._quantile(h, 0.5),
+                    "p99_s": self._quantile(h, 0.99),
+                    "max_s": h["max"]
+                }
+                for name, h in self.histograms.items()
+            }
+            return {"stages": stages, "counters": dict(self.counters)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def to_prometheus(self, prefix: str = "tutor") -> str:
+        """Render the histograms and counters in the Prometheus text format."""
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, h["counts"]):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {h["count"]}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {h["sum"]}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {h["count"]}')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+class JsonlExporter:
+    """Appends every span and counter event as a JSON line to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _write(self, event: Dict) -> None:
+        with self._lock:
+            self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def on_span(self, name: str, duration_s: float, attrs: Dict) -> None:
+        self._write({"ts": time.time(), "type": "span", "name": name,
+                     "duration_s": duration_s, **attrs})
+
+    def on_counter(self, name: str, value: float) -> None:
+        self._write({"ts": time.time(), "type": "counter", "name": name, "value": value})
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_default = Instrumentation()
+
+
+def get_instrumentation() -> Instrumentation:
+    """Process-wide instrumentation used by tutors that are not given their own.
+
+    Disabled until an exporter is added. Setting TUTOR_TRACE_JSONL to a path
+    enables it at import time with a JSONL exporter.
+    """
+    return _default
+
+
+if os.getenv("TUTOR_TRACE_JSONL"):
+    _default.add_exporter(JsonlExporter(os.environ["TUTOR_TRACE_JSONL"]))
@@ -0,0 +1,49 @@
+import re
+import unicodedata
+from typing import Optional
+
+# Language of text whose language could not be told, as in ISO 639-2
+UNDETERMINED = "und"
+
+# Frequent function words that are distinctive between the corpus languages;
+# words shared once accents are dropped (e.g. "a", "on", "an") are left out
+FUNCTION_WORDS = {
+    "fr": set("""
+le la les un une des du de au aux et est sont ou mais donc car que qui quoi dont ce cette ces
+cet il elle ils elles nous vous leur leurs son sa ses dans sur pour par avec sans pas plus tres
+comment pourquoi quel quelle quels quelles entre aussi ete etre avoir fait peut
+""".split()),
+    "en": set("""
+the and is are was were be been of to in for with without not what which who why how
+this that these those it its they their there from by as or but can does do has have more most
+between also than into about
+""".split())
+}
+
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+def _words(text: str):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return WORD_PATTERN.findall(text)
+
+
+def detect_language(text: str, min_hits: int = 2, margin: float = 1.5) -> Optional[str]:
+    """Language code ("fr" or "en") of a text, or None when it cannot be told.
+
+    Counts the function words of each language; one must occur at least
+    `min_hits` times and `margin` times as often as the other. Cheap enough
+    to run on every chunk and every question, and right on sentences, which
+    is all retrieval routing needs.
+    """
+    counts = {language: 0 for language in FUNCTION_WORDS}
+    for word in _words(text):
+        for language, words in FUNCTION_WORDS.items():
+            if word in words:
+                counts[language] += 1
+    (best, best_count), (_, second_count) = sorted(counts.items(), key=lambda item: item[1],
+                                                   reverse=True)
+    if best_count < min_hits or best_count < margin * second_count:
+        return None
+    return best
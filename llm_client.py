@@ -0,0 +1,560 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, Optional, Tuple
+
+from instrumentation import get_instrumentation
+from tokens import estimate_tokens
+
+DEFAULT_MODEL = "claude-2"
+
+# HTTP statuses of LLM errors worth retrying: rate limits, overload and server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 529}
+# Exceptions of the Anthropic SDK raised when no response came back
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError"}
+
+PRIORITIES = ("interactive", "background")
+# Background calls are held back this long after the last interactive one
+# while their lane is limited to `background_share` of the budget
+INTERACTIVE_WINDOW_S = 60.0
+
+ANTHROPIC_VERSION = "2023-06-01"
+
+_limiters: Dict[Tuple[Optional[int], Optional[int]], "RateLimiter"] = {}
+_limiters_lock = threading.Lock()
+_hedge_pools: Dict[int, Tuple[ThreadPoolExecutor, threading.BoundedSemaphore]] = {}
+
+# Hedges in flight at once per pool size; hedges beyond it are not sent
+DEFAULT_HEDGE_WORKERS = 16
+
+
+def get_rate_limiter(requests_per_minute: Optional[int] = None,
+                     tokens_per_minute: Optional[int] = None) -> Optional["RateLimiter"]:
+    """Return the process-wide limiter for a pair of limits, or None if there are none."""
+    if requests_per_minute is None and tokens_per_minute is None:
+        return None
+    key = (requests_per_minute, tokens_per_minute)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute)
+        return _limiters[key]
+
+
+def _get_hedge_pool(workers: int) -> Tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    """Process-wide pool running hedge calls, and the semaphore of its free workers."""
+    with _limiters_lock:
+        if workers not in _hedge_pools:
+            _hedge_pools[workers] = (
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-hedge"),
+                threading.BoundedSemaphore(workers)
+            )
+        return _hedge_pools[workers]
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Delay in seconds requested by the server's retry-after header, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an LLM call failed in a way a later attempt may not."""
+    if getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # Connection failures and timeouts of the SDK and of httpx, without importing either
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES or cls.__name__ == "TransportError"
+               for cls in type(error).__mro__)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when an LLM call still fails with a transient error after every retry."""
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, with two priority lanes.
+
+    Each call takes one request and its estimated tokens (prompt plus the
+    completion budget, the unused part being refunded afterwards). Calls
+    wait until both buckets hold enough. Interactive calls go first: a
+    background call waits while any interactive call is waiting, and while
+    interactive traffic was seen in the last minute it may only draw the
+    buckets down to `1 - background_share` of their capacity.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None, background_share: float = 0.75):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.background_share = background_share
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._last_interactive = float("-inf")
+        self._waiting = {priority: 0 for priority in PRIORITIES}
+        self._condition = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute,
+                                 self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute,
+                               self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _try_acquire(self, tokens: int, priority: str) -> float:
+        """Take the budget of a call and return 0, or return how long to wait for it."""
+        now = time.monotonic()
+        self._refill(now)
+        if priority == "interactive":
+            self._last_interactive = now
+        reserve = 0.0
+        if priority != "interactive":
+            if self._waiting["interactive"]:
+                return 0.05
+            if now - self._last_interactive < INTERACTIVE_WINDOW_S:
+                reserve = 1 - self.background_share
+
+        wait_s = 0.0
+        if self.requests_per_minute:
+            needed = 1 + reserve * self.requests_per_minute
+            wait_s = max(wait_s, (needed - self._requests) * 60 / self.requests_per_minute)
+        if self.tokens_per_minute:
+            # A call larger than the whole bucket only waits for a full bucket
+            cost = min(tokens, self.tokens_per_minute)
+            needed = cost + reserve * self.tokens_per_minute
+            wait_s = max(wait_s, (needed - self._tokens) * 60 / self.tokens_per_minute)
+        if wait_s > 0:
+            return wait_s
+
+        if self.requests_per_minute:
+            self._requests -= 1
+        if self.tokens_per_minute:
+            self._tokens -= min(tokens, self.tokens_per_minute)
+        return 0.0
+
+    def acquire(self, tokens: int, priority: str = "interactive") -> float:
+        """Wait for the budget of a call; returns the time waited in seconds."""
+        started = time.monotonic()
+        with self._condition:
+            wait_s = self._try_acquire(tokens, priority)
+            if not wait_s:
+                return 0.0
+            self._waiting[priority] += 1
+            try:
+                while wait_s:
+                    self._condition.wait(timeout=min(wait_s, 1.0))
+                    wait_s = self._try_acquire(tokens, priority)
+            finally:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+        return time.monotonic() - started
+
+    async def aacquire(self, tokens: int, priority: str = "interactive") -> float:
+        """Async counterpart of acquire."""
+        started = time.monotonic()
+        with self._condition:
+            wait_s = self._try_acquire(tokens, priority)
+            if not wait_s:
+                return 0.0
+            self._waiting[priority] += 1
+        try:
+            while wait_s:
+                await asyncio.sleep(min(wait_s, 1.0))
+                with self._condition:
+                    wait_s = self._try_acquire(tokens, priority)
+        finally:
+            with self._condition:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+        return time.monotonic() - started
+
+    def try_acquire(self, tokens: int, priority: str = "interactive") -> bool:
+        """Take the budget of a call only if it is available right away."""
+        with self._condition:
+            return not self._try_acquire(tokens, priority)
+
+    def refund(self, tokens: int, requests: int = 0) -> None:
+        """Give back tokens reserved for a call but not used, and requests never sent."""
+        tokens = tokens if self.tokens_per_minute and tokens > 0 else 0
+        requests = requests if self.requests_per_minute and requests > 0 else 0
+        if not tokens and not requests:
+            return
+        with self._condition:
+            if tokens:
+                self._tokens = min(self.tokens_per_minute, self._tokens + tokens)
+            if requests:
+                self._requests = min(self.requests_per_minute, self._requests + requests)
+            self._condition.notify_all()
+
+
+class _Completion:
+    def __init__(self, completion: str):
+        self.completion = completion
+
+
+class LLMHTTPError(Exception):
+    """Error response of the completions endpoint."""
+
+    def __init__(self, status_code: int, message: str, response=None):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        self.response = response
+
+
+def _raise_for_status(response) -> None:
+    if response.status_code < 400:
+        return
+    try:
+        message = response.json().get("error", {}).get("message", response.reason_phrase)
+    except (ValueError, AttributeError):
+        message = response.reason_phrase
+    raise LLMHTTPError(response.status_code, message, response)
+
+
+def _completion_payload(model: str, prompt: str, max_tokens_to_sample: int,
+                        temperature: float, stream: bool) -> Dict:
+    return {"model": model, "prompt": prompt, "max_tokens_to_sample": max_tokens_to_sample,
+            "temperature": temperature, "stream": stream}
+
+
+def _sse_completions(lines) -> Iterator[_Completion]:
+    """Completion events of a server-sent event stream."""
+    for line in lines:
+        if not line.startswith("data:"):
+            continue
+        event = json.loads(line[len("data:"):].strip())
+        if event.get("type") == "error":
+            raise LLMHTTPError(529, event.get("error", {}).get("message", "stream error"))
+        if event.get("type") == "completion":
+            yield _Completion(event.get("completion", ""))
+
+
+class _HTTPCompletions:
+    def __init__(self, http, headers: Dict):
+        self._http = http
+        self._headers = headers
+
+    def create(self, model: str, prompt: str, max_tokens_to_sample: int,
+               temperature: float = 1.0, stream: bool = False, **kwargs):
+        payload = _completion_payload(model, prompt, max_tokens_to_sample, temperature, stream)
+        if not stream:
+            response = self._http.post("/v1/complete", json=payload, headers=self._headers)
+            _raise_for_status(response)
+            return _Completion(response.json()["completion"])
+        return self._stream(payload)
+
+    def _stream(self, payload: Dict) -> Iterator[_Completion]:
+        with self._http.stream("POST", "/v1/complete", json=payload,
+                               headers=self._headers) as response:
+            if response.status_code >= 400:
+                response.read()
+            _raise_for_status(response)
+            yield from _sse_completions(response.iter_lines())
+
+
+class _AsyncHTTPCompletions(_HTTPCompletions):
+    async def create(self, model: str, prompt: str, max_tokens_to_sample: int,
+                     temperature: float = 1.0, **kwargs):
+        payload = _completion_payload(model, prompt, max_tokens_to_sample, temperature, False)
+        response = await self._http.post("/v1/complete", json=payload, headers=self._headers)
+        _raise_for_status(response)
+        return _Completion(response.json()["completion"])
+
+
+class HTTPAnthropic:
+    """Minimal Anthropic text completions client on a pooled httpx connection pool.
+
+    Speaks the `/v1/complete` protocol, so it can be pointed at the Anthropic
+    API, a proxy or fake_llm_server; `completions.create` has the same shape
+    as in the SDK. Retries are left to LLMClient.
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: float = 60.0,
+                 max_connections: int = 100, asynchronous: bool = False):
+        import httpx
+
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_connections)
+        client_class = httpx.AsyncClient if asynchronous else httpx.Client
+        self._http = client_class(base_url=base_url.rstrip("/"), timeout=timeout, limits=limits)
+        headers = {"anthropic-version": ANTHROPIC_VERSION, "x-api-key": api_key or ""}
+        completions_class = _AsyncHTTPCompletions if asynchronous else _HTTPCompletions
+        self.completions = completions_class(self._http, headers)
+
+    def close(self) -> None:
+        self._http.close()
+
+
+class LLMClient:
+    """Completion calls with rate limiting, retries, hedging and priority lanes.
+
+    Every call waits for its budget in the shared RateLimiter, if any, then
+    runs on the given client (Anthropic SDK, HTTPAnthropic or a stand-in
+    with the same `completions.create`). Rate-limited, overloaded and
+    failed connections are retried with jittered exponential backoff, or
+    after the server's retry-after delay. With `hedge_after`, an interactive
+    call still unanswered after that many seconds is sent a second time and
+    the first answer wins, cutting the latency tail at the price of a few
+    extra calls; hedges are only sent when the rate limit has room for them
+    and one of the `hedge_workers` shared hedge threads is free, so a
+    saturated process does not add load by hedging.
+
+    Args:
+        client: Sync client; the shared Anthropic client when None
+        async_client: Async client; the shared one of the running loop when None
+        limiter: Shared rate limiter, or None for no client-side limits
+        hedge_after: Seconds before an interactive call is hedged; None disables hedging
+        hedge_workers: Hedges in flight at once, shared by clients with the same value
+    """
+
+    def __init__(self, client=None, async_client=None, model: str = DEFAULT_MODEL,
+                 limiter: Optional[RateLimiter] = None, max_retries: int = 4,
+                 base_delay: float = 0.5, max_delay: float = 30.0,
+                 hedge_after: Optional[float] = None,
+                 hedge_workers: int = DEFAULT_HEDGE_WORKERS, instrumentation=None):
+        self._client = client
+        self._async_client = async_client
+        self.model = model
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.hedge_workers = hedge_workers
+        self.instrumentation = instrumentation or get_instrumentation()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from resources import get_anthropic_client
+
+            self._client = get_anthropic_client()
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is not None:
+            return self._async_client
+        from resources import get_async_anthropic_client
+
+        return get_async_anthropic_client()
+
+    # Scheduling
+
+    def _acquire(self, prompt: str, max_tokens: int, priority: str) -> int:
+        tokens = estimate_tokens(prompt) + max_tokens
+        if self.limiter is not None:
+            waited = self.limiter.acquire(tokens, priority)
+            if waited:
+                self.instrumentation.record("llm_rate_wait", waited, {"priority": priority})
+        return tokens
+
+    async def _aacquire(self, prompt: str, max_tokens: int, priority: str) -> int:
+        tokens = estimate_tokens(prompt) + max_tokens
+        if self.limiter is not None:
+            waited = await self.limiter.aacquire(tokens, priority)
+            if waited:
+                self.instrumentation.record("llm_rate_wait", waited, {"priority": priority})
+        return tokens
+
+    def _refund(self, reserved: int, prompt: str, completion: str) -> None:
+        if self.limiter is not None:
+            self.limiter.refund(reserved - estimate_tokens(prompt) - estimate_tokens(completion))
+
+    def _settle_hedge(self, hedge, sent: bool, reserved: int, prompt: str) -> None:
+        """Refund what a finished hedge did not use: everything when it was never sent."""
+        if self.limiter is None:
+            return
+        if not sent:
+            self.limiter.refund(reserved, requests=1)
+        elif hedge.cancelled() or hedge.exception() is not None:
+            self._refund(reserved, prompt, "")
+        else:
+            self._refund(reserved, prompt, hedge.result())
+
+    def _backoff(self, error: Exception, attempt: int) -> float:
+        """Delay before the next attempt; raises if the error is final."""
+        if not is_retryable(error):
+            raise error
+        if attempt == self.max_retries:
+            raise LLMUnavailableError(str(error)) from error
+        self.instrumentation.incr("retries")
+        delay = retry_after(error)
+        if delay is None:
+            delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+        return delay
+
+    # Calls
+
+    def _call(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        with self.instrumentation.span("llm"):
+            response = self.client.completions.create(
+                model=self.model,
+                prompt=prompt,
+                max_tokens_to_sample=max_tokens,
+                temperature=temperature
+            )
+        return response.completion
+
+    def _call_hedged(self, prompt: str, max_tokens: int, temperature: float,
+                     reserved: int) -> str:
+        # The primary gets a thread of its own rather than a pool slot, so it
+        # starts at once and the hedge delay is never spent queueing. It is
+        # not run on the calling thread, which must be free to return the
+        # hedge's answer while the primary's call is still blocked.
+        primary: Future = Future()
+        primary.set_running_or_notify_cancel()
+
+        def run_primary() -> None:
+            try:
+                primary.set_result(self._call(prompt, max_tokens, temperature))
+            except BaseException as e:
+                primary.set_exception(e)
+
+        threading.Thread(target=run_primary, name="llm-primary", daemon=True).start()
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+        pool, free_workers = _get_hedge_pool(self.hedge_workers)
+        if not free_workers.acquire(blocking=False):
+            return primary.result()
+        if self.limiter is not None and not self.limiter.try_acquire(reserved):
+            free_workers.release()
+            return primary.result()
+
+        self.instrumentation.incr("llm_hedges")
+        hedge = pool.submit(self._call, prompt, max_tokens, temperature)
+        hedge.add_done_callback(lambda _: free_workers.release())
+        # A future cancelled before it ran never sent its request
+        hedge.add_done_callback(
+            lambda future: self._settle_hedge(future, not future.cancelled(), reserved, prompt)
+        )
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.instrumentation.incr("llm_hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def complete(self, prompt: str, max_tokens: int, temperature: float,
+                 priority: str = "interactive") -> str:
+        """Run a completion and return its text, raising once retries are exhausted."""
+        for attempt in range(self.max_retries + 1):
+            reserved = self._acquire(prompt, max_tokens, priority)
+            try:
+                if self.hedge_after is not None and priority == "interactive":
+                    completion = self._call_hedged(prompt, max_tokens, temperature, reserved)
+                else:
+                    completion = self._call(prompt, max_tokens, temperature)
+            except Exception as e:
+                self._refund(reserved, prompt, "")
+                time.sleep(self._backoff(e, attempt))
+                continue
+            self._refund(reserved, prompt, completion)
+            return completion
+
+    def stream(self, prompt: str, max_tokens: int, temperature: float,
+               priority: str = "interactive") -> Iterator[str]:
+        """Stream a completion as text deltas.
+
+        Failures before the first delta are retried like complete(); once
+        text was yielded, errors are raised since the reader already saw it.
+        """
+        for attempt in range(self.max_retries + 1):
+            reserved = self._acquire(prompt, max_tokens, priority)
+            deltas = []
+            try:
+                for event in self.client.completions.create(
+                    model=self.model,
+                    prompt=prompt,
+                    max_tokens_to_sample=max_tokens,
+                    temperature=temperature,
+                    stream=True
+                ):
+                    deltas.append(event.completion)
+                    yield event.completion
+            except Exception as e:
+                self._refund(reserved, prompt, "".join(deltas))
+                if deltas:
+                    raise
+                time.sleep(self._backoff(e, attempt))
+                continue
+            self._refund(reserved, prompt, "".join(deltas))
+            return
+
+    async def _acall(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        with self.instrumentation.span("llm"):
+            response = await self.async_client.completions.create(
+                model=self.model,
+                prompt=prompt,
+                max_tokens_to_sample=max_tokens,
+                temperature=temperature
+            )
+        return response.completion
+
+    async def _acall_hedged(self, prompt: str, max_tokens: int, temperature: float,
+                            reserved: int) -> str:
+        primary = asyncio.ensure_future(self._acall(prompt, max_tokens, temperature))
+        done, _ = await asyncio.wait([primary], timeout=self.hedge_after)
+        if done or (self.limiter is not None and not self.limiter.try_acquire(reserved)):
+            return await primary
+
+        self.instrumentation.incr("llm_hedges")
+        sent = []
+
+        async def call_hedge() -> str:
+            sent.append(True)
+            return await self._acall(prompt, max_tokens, temperature)
+
+        hedge = asyncio.ensure_future(call_hedge())
+        hedge.add_done_callback(lambda task: self._settle_hedge(task, bool(sent), reserved, prompt))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.instrumentation.incr("llm_hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acomplete(self, prompt: str, max_tokens: int, temperature: float,
+                        priority: str = "interactive") -> str:
+        """Async counterpart of complete."""
+        for attempt in range(self.max_retries + 1):
+            reserved = await self._aacquire(prompt, max_tokens, priority)
+            try:
+                if self.hedge_after is not None and priority == "interactive":
+                    completion = await self._acall_hedged(prompt, max_tokens, temperature, reserved)
+                else:
+                    completion = await self._acall(prompt, max_tokens, temperature)
+            except Exception as e:
+                self._refund(reserved, prompt, "")
+                await asyncio.sleep(self._backoff(e, attempt))
+                continue
+            self._refund(reserved, prompt, completion)
+            return completion
@@ -0,0 +1,51 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_memos: Dict[str, "LRUCache"] = {}
+_memos_lock = threading.Lock()
+
+
+def shared_memo(name: str, maxsize: int = 1024) -> "LRUCache":
+    """Return the process-wide LRU memo registered under a name."""
+    with _memos_lock:
+        if name not in _memos:
+            _memos[name] = LRUCache(maxsize)
+        return _memos[name]
+
+
+class LRUCache:
+    """Small thread-safe, bounded least-recently-used mapping."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value for a key, or None, marking it as recently used."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
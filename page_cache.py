@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, List, Optional
+
+CACHE_FILENAME = "page_cache.sqlite3"
+
+_caches: Dict[str, "PageTextCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def load_page_cache(persist_directory: str) -> "PageTextCache":
+    """Return the process-wide page text cache stored in the given directory."""
+    path = os.path.abspath(os.path.join(persist_directory, CACHE_FILENAME))
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = PageTextCache(path)
+        return _caches[path]
+
+
+class PageTextCache:
+    """Extracted PDF text per (file hash, page), zlib-compressed in SQLite.
+
+    Keyed by content hash, so renamed or re-uploaded copies of a file and
+    re-chunking with new settings reuse the text instead of parsing the PDF.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS files (
+            file_hash TEXT PRIMARY KEY, n_pages INTEGER
+        )""")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS pages (
+            file_hash TEXT, page INTEGER, text BLOB, PRIMARY KEY (file_hash, page)
+        )""")
+        self._db.commit()
+
+    def get(self, file_hash: str) -> Optional[List[str]]:
+        """Text of every page of a file, or None if it was never extracted."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT n_pages FROM files WHERE file_hash = ?", (file_hash,)
+            ).fetchone()
+            if row is None:
+                return None
+            rows = self._db.execute(
+                "SELECT text FROM pages WHERE file_hash = ? ORDER BY page", (file_hash,)
+            ).fetchall()
+        if len(rows) != row[0]:
+            return None
+        return [zlib.decompress(text).decode("utf-8") for text, in rows]
+
+    def put(self, file_hash: str, pages: List[str]) -> None:
+        """Store the text of every page of a file."""
+        compressed = [(file_hash, i, zlib.compress(text.encode("utf-8")))
+                      for i, text in enumerate(pages)]
+        with self._lock:
+            self._db.execute("DELETE FROM pages WHERE file_hash = ?", (file_hash,))
+            self._db.executemany("INSERT INTO pages VALUES (?, ?, ?)", compressed)
+            self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?)", (file_hash, len(pages)))
+            self._db.commit()
+
+    def discard(self, file_hash: str) -> None:
+        """Forget the text of a file."""
+        with self._lock:
+            self._db.execute("DELETE FROM pages WHERE file_hash = ?", (file_hash,))
+            self._db.execute("DELETE FROM files WHERE file_hash = ?", (file_hash,))
+            self._db.commit()
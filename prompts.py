@@ -0,0 +1,149 @@
+import functools
+from typing import Optional
+
+from tokens import estimate_tokens
+
+# Turn markers of the Anthropic text completions API, the same strings as
+# anthropic.HUMAN_PROMPT and anthropic.AI_PROMPT without importing the SDK
+HUMAN_PROMPT = "\n\nHuman:"
+AI_PROMPT = "\n\nAssistant:"
+
+LANGUAGE_NAMES = {"fr": "French", "en": "English"}
+
+_RESPONSE_INSTRUCTIONS = """{human}
+You are a friendly and encouraging economics tutor who makes learning feel like an exciting conversation between friends. Your tone is warm and supportive, and you're genuinely interested in your student's thoughts and experiences.
+
+Personality traits to convey:
+- Warm and welcoming
+- Genuinely enthusiastic about economics
+- Encouraging and supportive
+- Patient and understanding
+- Interested in student's perspectives
+
+Communication style:
+- Use friendly openings like "{opening}"
+- Add encouraging phrases
+- Show enthusiasm with occasional "!" and positive reinforcement
+- Use inclusive language to create a collaborative feeling
+- Keep a conversational, natural tone
+
+Choose ONE of these teaching patterns (or blend naturally if appropriate):
+
+1. Friendly Socratic
+2. Relatable Examples
+3. Interactive Scenario
+4. Comparative Discussion
+5. Personal Connection
+
+Style requirements:
+- Keep responses warm and encouraging
+- Use **bold** for key concepts
+- Stay concise but friendly
+- End with an inviting question
+
+Response language: {language}
+
+The conversation so far, the context from the course materials and the student's question follow."""
+
+_QUIZ_INSTRUCTIONS = """{human}
+Create an interactive economics quiz in {language} on the topic given below. Return ONLY the JSON structure below with no additional text or explanations.
+
+Return EXACTLY this structure and nothing else (no introduction or extra text):
+{{
+    "questions": [
+        {{
+            "question": "Write the first question here",
+            "options": [
+                {{
+                    "text": "Correct answer",
+                    "correct": true,
+                    "explanation": "Why this is correct"
+                }},
+                {{
+                    "text": "Wrong answer 1",
+                    "correct": false,
+                    "explanation": "Why this is incorrect"
+                }},
+                {{
+                    "text": "Wrong answer 2",
+                    "correct": false,
+                    "explanation": "Why this is incorrect"
+                }}
+            ]
+        }},
+        {{
+            "question": "Write the second question here",
+            "options": [Similar structure]
+        }},
+        {{
+            "question": "Write the third question here",
+            "options": [Similar structure]
+        }}
+    ]
+}}
+
+The topic, the context from the course materials and the conversation so far follow."""
+
+
+class PromptPrefix:
+    """Static leading part of a prompt, with its token estimate computed once."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = estimate_tokens(text)
+
+
+@functools.lru_cache(maxsize=None)
+def response_prefix(language: str) -> PromptPrefix:
+    """Instructions opening every tutoring prompt in a language."""
+    return PromptPrefix(_RESPONSE_INSTRUCTIONS.format(
+        human=HUMAN_PROMPT,
+        opening="Ah, belle question!" if language == "fr" else "Ah, great question!",
+        language=LANGUAGE_NAMES.get(language, "English")
+    ))
+
+
+@functools.lru_cache(maxsize=None)
+def quiz_prefix(language: str) -> PromptPrefix:
+    """Instructions and JSON structure opening every quiz prompt in a language."""
+    return PromptPrefix(_QUIZ_INSTRUCTIONS.format(
+        human=HUMAN_PROMPT, language=LANGUAGE_NAMES.get(language, "English")
+    ))
+
+
+def build_response_prompt(query: str, context: str, language: str = "fr",
+                          history: str = "") -> str:
+    """Tutoring prompt: the static prefix first, then what changes with every question.
+
+    The prefix is built once per language and is byte-identical in every
+    prompt, so prompts differ only by the history, context and question
+    after it, and the prefix's share of the prompt tokens can be reported.
+    The completions API has no prompt caching, so it is still sent and
+    billed with every call.
+    """
+    sections = [response_prefix(language).text]
+    if history:
+        sections.append(f"Conversation so far:\n{history}")
+    sections.append(f"Context from materials:\n{context}")
+    sections.append(f"Student question: {query}")
+    sections.append("Create a friendly, engaging response using your chosen pattern.")
+    return "\n\n".join(sections) + AI_PROMPT
+
+
+def build_quiz_prompt(topic: str, context: str, language: str = "fr",
+                      history: str = "") -> str:
+    """Quiz prompt: the static prefix first, then the topic, context and history."""
+    sections = [quiz_prefix(language).text, f"Topic: {topic}",
+                f"Context from materials:\n{context}"]
+    if history:
+        sections.append(f"Conversation so far:\n{history}")
+    return "\n\n".join(sections) + AI_PROMPT
+
+
+def static_prefix(prompt: str) -> Optional[PromptPrefix]:
+    """Static prefix a prompt starts with, if any, to count its tokens apart."""
+    for language in LANGUAGE_NAMES:
+        for prefix in (response_prefix(language), quiz_prefix(language)):
+            if prompt.startswith(prefix.text):
+                return prefix
+    return None
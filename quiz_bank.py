@@ -0,0 +1,243 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from bm25_index import tokenize
+
+BANK_FILENAME = "quiz_bank.sqlite3"
+SYLLABUS_FILENAME = "programme_ses.pdf"
+
+# Syllabus "questionnements" are the questions opening each row of the programme tables
+SYLLABUS_QUESTION = re.compile(
+    r"^((?:Quel(?:le)?s?|Comment|Pourquoi|En quoi|Dans quelle|Qu['’]est)\b[^?]{5,160}?\?)",
+    re.MULTILINE
+)
+
+_banks: Dict[str, "QuizBank"] = {}
+_banks_lock = threading.Lock()
+
+
+def normalize_topic(topic: str) -> str:
+    """Bank key of a topic, so "L'inflation" and "inflation" share quizzes."""
+    return " ".join(tokenize(topic))
+
+
+def syllabus_topics(pdf_path: str) -> List[str]:
+    """Questions of the syllabus tables in the order they appear, without duplicates."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(pdf_path)
+    text = "\n".join(page.extract_text() or "" for page in reader.pages)
+    topics = []
+    for match in SYLLABUS_QUESTION.finditer(text):
+        topic = re.sub(r"\s+", " ", match.group(1)).replace(" ?", "?").strip()
+        if topic not in topics:
+            topics.append(topic)
+    return topics
+
+
+def load_quiz_bank(persist_directory: str, **kwargs) -> "QuizBank":
+    """Return the process-wide quiz bank stored in the given directory."""
+    path = os.path.abspath(os.path.join(persist_directory, BANK_FILENAME))
+    with _banks_lock:
+        if path not in _banks:
+            _banks[path] = QuizBank(path, **kwargs)
+        return _banks[path]
+
+
+class QuizBank:
+    """Validated quizzes generated ahead of time, keyed by topic, difficulty and language.
+
+    `take` serves a stored quiz without any retrieval or LLM call, and
+    `refill` tops a key back up to `depth` quizzes on a small background
+    pool. Only the keys the bank maintains are refilled: those prefilled
+    (e.g. the syllabus topics) and those a stored quiz was served from, so
+    one-off topics never cost background generations. At most `max_stored`
+    quizzes are kept. Every quiz is tied to the corpus version it was
+    generated from, and quizzes of other versions are dropped as soon as a
+    new version is seen. Quizzes are mirrored to SQLite so the bank
+    survives restarts.
+    """
+
+    def __init__(self, path: Optional[str] = None, depth: int = 2, max_workers: int = 2,
+                 max_stored: int = 1000):
+        self.path = path
+        self.depth = depth
+        self.max_stored = max_stored
+        self.corpus_version: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._quizzes: Dict[Tuple[str, str, str], Deque[Tuple[int, str]]] = defaultdict(deque)
+        self._pending: Dict[Tuple[str, str, str], int] = {}
+        self._maintained: Set[Tuple[str, str, str]] = set()
+        self._closed = False
+        self._stored = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quiz-bank")
+        self._next_id = 0
+        self._metrics = {"hits": 0, "misses": 0, "generated": 0, "failures": 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("""CREATE TABLE IF NOT EXISTS quizzes (
+                id INTEGER PRIMARY KEY, topic TEXT, difficulty TEXT, language TEXT,
+                corpus_version TEXT, quiz TEXT, created_at REAL
+            )""")
+            self._db.commit()
+            self._load()
+
+    def _load(self) -> None:
+        rows = self._db.execute(
+            "SELECT id, topic, difficulty, language, corpus_version, quiz FROM quizzes ORDER BY id"
+        ).fetchall()
+        for row in rows:
+            self._quizzes[(row[1], row[2], row[3])].append((row[0], row[5]))
+            self.corpus_version = row[4]
+        self._stored = len(rows)
+        self._next_id = rows[-1][0] + 1 if rows else 0
+
+    def _check_version(self, corpus_version: str) -> None:
+        """Drop every quiz if the corpus changed since they were generated."""
+        if corpus_version != self.corpus_version:
+            if any(self._quizzes.values()):
+                print("Corpus changed, clearing quiz bank")
+            self._quizzes.clear()
+            self._stored = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM quizzes")
+                self._db.commit()
+            self.corpus_version = corpus_version
+
+    def take(self, topic: str, difficulty: str, language: str,
+             corpus_version: str) -> Optional[str]:
+        """Remove and return a stored quiz JSON for the topic, or None."""
+        key = (normalize_topic(topic), difficulty, language)
+        with self._lock:
+            self._check_version(corpus_version)
+            quizzes = self._quizzes.get(key)
+            if not quizzes:
+                self._metrics["misses"] += 1
+                return None
+            quiz_id, quiz = quizzes.popleft()
+            if not quizzes:
+                del self._quizzes[key]
+            self._stored -= 1
+            self._maintained.add(key)
+            if self._db is not None:
+                self._db.execute("DELETE FROM quizzes WHERE id = ?", (quiz_id,))
+                self._db.commit()
+            self._metrics["hits"] += 1
+            return quiz
+
+    def put(self, topic: str, difficulty: str, language: str,
+            corpus_version: str, quiz: str) -> None:
+        """Store a validated quiz JSON.
+
+        Quizzes of an outdated corpus version, and quizzes beyond
+        `max_stored`, are discarded.
+        """
+        key = (normalize_topic(topic), difficulty, language)
+        with self._lock:
+            if corpus_version != self.corpus_version or self._stored >= self.max_stored:
+                return
+            quiz_id = self._next_id
+            self._next_id += 1
+            self._quizzes[key].append((quiz_id, quiz))
+            self._stored += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT INTO quizzes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (quiz_id, *key, corpus_version, quiz, time.time())
+                )
+                self._db.commit()
+
+    def maintains(self, topic: str, difficulty: str, language: str) -> bool:
+        """Whether the bank keeps quizzes on a topic topped up."""
+        with self._lock:
+            return (normalize_topic(topic), difficulty, language) in self._maintained
+
+    def refill(self, topic: str, difficulty: str, language: str, corpus_version: str,
+               generate: Callable[[str, str, str], str]) -> int:
+        """Generate quizzes in the background until the topic holds `depth` of them.
+
+        The topic is maintained from then on; see `maintains`.
+
+        Args:
+            topic: Quiz topic
+            difficulty: Quiz difficulty
+            language: Quiz language
+            corpus_version: Corpus version the quizzes will be generated from
+            generate: Called as generate(topic, difficulty, language); returns a
+                validated quiz JSON or raises
+
+        Returns:
+            Number of quizzes scheduled
+        """
+        key = (normalize_topic(topic), difficulty, language)
+        with self._lock:
+            if self._closed:
+                return 0
+            self._check_version(corpus_version)
+            self._maintained.add(key)
+            missing = self.depth - len(self._quizzes.get(key, ())) - self._pending.get(key, 0)
+            if missing <= 0:
+                return 0
+            self._pending[key] = self._pending.get(key, 0) + missing
+        for _ in range(missing):
+            self._executor.submit(self._fill, key, topic, corpus_version, generate)
+        return missing
+
+    def _fill(self, key: Tuple[str, str, str], topic: str, corpus_version: str,
+              generate: Callable[[str, str, str], str]) -> None:
+        _, difficulty, language = key
+        try:
+            quiz = generate(topic, difficulty, language)
+        except Exception as e:
+            print(f"Quiz bank: could not generate a quiz on {topic!r}: {e}")
+            with self._lock:
+                self._metrics["failures"] += 1
+        else:
+            self.put(topic, difficulty, language, corpus_version, quiz)
+            with self._lock:
+                self._metrics["generated"] += 1
+        finally:
+            with self._lock:
+                remaining = self._pending.pop(key, 0) - 1
+                if remaining > 0:
+                    self._pending[key] = remaining
+
+    def close(self) -> None:
+        """Cancel the quiz generations not started yet, so shutting down does not wait on them.
+
+        Later refills are ignored; stored quizzes can still be taken.
+        """
+        with self._lock:
+            self._closed = True
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._pending.clear()
+
+    def clear(self) -> None:
+        """Drop every stored quiz."""
+        with self._lock:
+            self._quizzes.clear()
+            self._stored = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM quizzes")
+                self._db.commit()
+
+    def metrics(self) -> Dict:
+        """Hit rate, generated and failed quizzes since the process started."""
+        with self._lock:
+            lookups = self._metrics["hits"] + self._metrics["misses"]
+            return {
+                **self._metrics,
+                "hit_rate": self._metrics["hits"] / lookups if lookups else 0.0,
+                "stored": self._stored,
+                "pending": sum(self._pending.values())
+            }
@@ -0,0 +1,112 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from memo import shared_memo
+
+# Multilingual MiniLM cross-encoder trained on mMARCO; the corpus is French and
+# questions come in French and English
+DEFAULT_RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+_lock = threading.Lock()
+_rerankers: Dict[str, "CrossEncoderReranker"] = {}
+
+
+def get_reranker(model_name: str = DEFAULT_RERANK_MODEL) -> "CrossEncoderReranker":
+    """Return the shared cross-encoder reranker for a model."""
+    with _lock:
+        if model_name not in _rerankers:
+            _rerankers[model_name] = CrossEncoderReranker(model_name)
+        return _rerankers[model_name]
+
+
+class CrossEncoderReranker:
+    """Rescores retrieval candidates with a cross-encoder run on CPU.
+
+    The model reads the question and a chunk together, which ranks far better
+    than embedding similarity but costs a forward pass per pair. Pairs are
+    scored in batches and their scores memoized per (question, chunk), so a
+    repeated or overlapping question only scores the chunks it has not seen.
+    Scores are probabilities of relevance in [0, 1].
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, batch_size: int = 32,
+                 cache_size: int = 16384):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+        self._scores = shared_memo(f"rerank_scores:{model_name}", maxsize=cache_size)
+
+    def load(self):
+        """Load the model if it is not loaded yet, and return it."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def score(self, pairs: List[Tuple[str, str, str]], instrumentation=None) -> List[float]:
+        """Relevance of (question, chunk ID, chunk text) triples, from the memo when possible."""
+        scores: List[Optional[float]] = [self._scores.get((query, doc_id, document))
+                                         for query, doc_id, document in pairs]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if instrumentation is not None:
+            instrumentation.incr("rerank_cache_hits", len(pairs) - len(missing))
+        if not missing:
+            return scores
+
+        model = self.load()
+        cpu_started = time.process_time()
+        predicted = model.predict([(pairs[i][0], pairs[i][2]) for i in missing],
+                                  batch_size=self.batch_size, show_progress_bar=False)
+        if instrumentation is not None:
+            # Process CPU time, so it includes the model's intra-op threads
+            instrumentation.record("rerank_cpu", time.process_time() - cpu_started,
+                                   {"pairs": len(missing)})
+            instrumentation.incr("rerank_pairs_scored", len(missing))
+        for i, score in zip(missing, predicted):
+            scores[i] = float(score)
+            self._scores.put(pairs[i], scores[i])
+        return scores
+
+    def rerank_batch(self, queries: List[str], results: List[Dict], n_results: int,
+                     min_score: float, instrumentation=None) -> List[Dict]:
+        """Reorder single-query Chroma-shaped results by cross-encoder score.
+
+        Only candidates scoring at least `min_score` are kept, at most
+        `n_results` of them, so a result may hold zero, one or several chunks.
+        Candidates of every query are scored in the same batches. The kept
+        scores are added to each result under "rerank_scores".
+        """
+        pairs = [(query, doc_id, document)
+                 for query, result in zip(queries, results)
+                 for doc_id, document in zip(result["ids"][0], result["documents"][0])]
+        scores = iter(self.score(pairs, instrumentation))
+
+        reranked = []
+        for result in results:
+            rows = sorted(
+                ((next(scores), row) for row in zip(result["ids"][0], result["documents"][0],
+                                                    result["metadatas"][0],
+                                                    result["distances"][0])),
+                key=lambda scored: scored[0], reverse=True
+            )
+            kept = [(score, row) for score, row in rows if score >= min_score][:n_results]
+            reranked.append({
+                "ids": [[row[0] for _, row in kept]],
+                "documents": [[row[1] for _, row in kept]],
+                "metadatas": [[row[2] for _, row in kept]],
+                "distances": [[row[3] for _, row in kept]],
+                "rerank_scores": [[score for score, _ in kept]]
+            })
+            if instrumentation is not None:
+                instrumentation.incr("rerank_kept", len(kept))
+        return reranked
+
+    def rerank(self, query: str, results: Dict, n_results: int, min_score: float,
+               instrumentation=None) -> Dict:
+        """Rerank the results of a single query; see rerank_batch."""
+        return self.rerank_batch([query], [results], n_results, min_score, instrumentation)[0]
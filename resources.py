@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import json
+import re
+import resource
+import subprocess
+import sys
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+# chromadb, anthropic and sentence-transformers take seconds to import, so they
+# are imported when a client or model is first needed
+if TYPE_CHECKING:
+    from anthropic import Anthropic, AsyncAnthropic
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Maps French and English text to the same space, so questions in either
+# language find chunks in the other; same 384 dimensions, about twice as slow
+MULTILINGUAL_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+_lock = threading.Lock()
+_embedders: Dict[str, "LazyEmbeddingFunction"] = {}
+_chroma_clients: Dict[str, object] = {}
+_anthropic_clients: Dict[tuple, Anthropic] = {}
+# Async clients and semaphores are bound to the event loop that created them
+_async_anthropic_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_stage_semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+class LazyEmbeddingFunction:
+    """Sentence-transformers embedding function that loads its model on first use."""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._function = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load the model if it is not loaded yet, and return the underlying function."""
+        if self._function is None:
+            with self._lock:
+                if self._function is None:
+                    from chromadb.utils import embedding_functions
+                    self._function = embedding_functions.SentenceTransformerEmbeddingFunction(
+                        model_name=self.model_name
+                    )
+        return self._function
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.load()(input)
+
+
+def get_embedding_function(model_name: str = DEFAULT_EMBEDDING_MODEL) -> LazyEmbeddingFunction:
+    """Return the shared sentence-transformers embedding function for a model."""
+    with _lock:
+        if model_name not in _embedders:
+            _embedders[model_name] = LazyEmbeddingFunction(model_name)
+        return _embedders[model_name]
+
+
+def embedding_collection_name(collection_name: str, model_name: str) -> str:
+    """Name of the collection holding a corpus embedded with a model.
+
+    The default model keeps the plain name; any other gets its own
+    collection, since vectors of different models cannot share an index.
+    """
+    if model_name == DEFAULT_EMBEDDING_MODEL:
+        return collection_name
+    slug = re.sub(r"[^a-z0-9]+", "-", model_name.split("/")[-1].lower()).strip("-")
+    return f"{collection_name}-{slug}"[:63].rstrip("-_")
+
+
+def get_chroma_client(persist_directory: str):
+    """Return the shared Chroma client for a persist directory."""
+    key = os.path.abspath(persist_directory)
+    with _lock:
+        if key not in _chroma_clients:
+            import chromadb
+            from chromadb.config import Settings
+
+            _chroma_clients[key] = chromadb.Client(Settings(
+                persist_directory=persist_directory
+            ))
+        return _chroma_clients[key]
+
+
+def get_anthropic_client(api_key: Optional[str] = None,
+                         base_url: Optional[str] = None) -> Anthropic:
+    """Return the shared Anthropic client, whose HTTP connection pool is reused by all sessions.
+    
+    Retries are left to llm_client.LLMClient. With a base URL (or
+    TUTOR_LLM_BASE_URL), an llm_client.HTTPAnthropic pointed at it is
+    returned instead, e.g. for a proxy or fake_llm_server.
+    """
+    api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+    base_url = base_url or os.getenv("TUTOR_LLM_BASE_URL")
+    if not api_key and not base_url:
+        raise ValueError("ANTHROPIC_API_KEY environment variable not found")
+    key = (api_key, base_url)
+    with _lock:
+        if key not in _anthropic_clients:
+            if base_url:
+                from llm_client import HTTPAnthropic
+
+                _anthropic_clients[key] = HTTPAnthropic(base_url, api_key)
+            else:
+                from anthropic import Anthropic
+
+                _anthropic_clients[key] = Anthropic(api_key=api_key, max_retries=0)
+        return _anthropic_clients[key]
+
+
+def get_async_anthropic_client(api_key: Optional[str] = None,
+                               base_url: Optional[str] = None) -> AsyncAnthropic:
+    """Return the async Anthropic client shared by all coroutines of the running event loop."""
+    api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+    base_url = base_url or os.getenv("TUTOR_LLM_BASE_URL")
+    if not api_key and not base_url:
+        raise ValueError("ANTHROPIC_API_KEY environment variable not found")
+    loop = asyncio.get_running_loop()
+    key = (api_key, base_url)
+    with _lock:
+        clients = _async_anthropic_clients.setdefault(loop, {})
+        if key not in clients:
+            if base_url:
+                from llm_client import HTTPAnthropic
+
+                clients[key] = HTTPAnthropic(base_url, api_key, asynchronous=True)
+            else:
+                from anthropic import AsyncAnthropic
+
+                clients[key] = AsyncAnthropic(api_key=api_key, max_retries=0)
+        return clients[key]
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the bounded thread pool used to offload blocking embedding and Chroma work.
+
+    Its size is read from TUTOR_EXECUTOR_WORKERS (default 8).
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("TUTOR_EXECUTOR_WORKERS", "8")),
+                thread_name_prefix="tutor"
+            )
+        return _executor
+
+
+def get_stage_semaphore(stage: str, limit: int) -> asyncio.Semaphore:
+    """Return the process-wide semaphore bounding concurrency of a stage on the running loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        semaphores = _stage_semaphores.setdefault(loop, {})
+        if stage not in semaphores:
+            semaphores[stage] = asyncio.Semaphore(limit)
+        return semaphores[stage]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure_sessions(n_sessions: int = 20, **tutor_kwargs) -> Dict:
+    """Measure the cost of opening tutor sessions in this process.
+
+    Returns:
+        Dict with the construction time of the first and the following
+        sessions (in seconds) and the peak RSS before and after (in MB)
+    """
+    from AI_tutor import EconomicsTutor
+
+    rss_before = peak_rss_mb()
+    timings = []
+    tutors = []
+    for _ in range(n_sessions):
+        started = time.perf_counter()
+        tutor = EconomicsTutor(**tutor_kwargs)
+        tutor.hf_embed(["warm-up"])
+        timings.append(time.perf_counter() - started)
+        tutors.append(tutor)
+
+    later = timings[1:] or [0.0]
+    return {
+        "sessions": n_sessions,
+        "first_session_s": timings[0],
+        "next_sessions_mean_s": sum(later) / len(later),
+        "peak_rss_before_mb": rss_before,
+        "peak_rss_after_mb": peak_rss_mb()
+    }
+
+
+# Run in a fresh interpreter by profile_startup; prints the first-use timings as JSON
+_STARTUP_SCRIPT = """
+import json, time
+timings = {}
+started = time.perf_counter()
+import AI_tutor
+timings["import_s"] = time.perf_counter() - started
+started = time.perf_counter()
+tutor = AI_tutor.EconomicsTutor()
+timings["construct_s"] = time.perf_counter() - started
+for stage, first_use in (("chroma_client_s", lambda: tutor.chroma_client),
+                         ("embedding_model_s", lambda: tutor.hf_embed(["warm-up"])),
+                         ("anthropic_client_s", lambda: tutor.anthropic)):
+    started = time.perf_counter()
+    try:
+        first_use()
+        timings[stage] = time.perf_counter() - started
+    except Exception as e:
+        timings[stage] = None
+        timings[stage[:-2] + "_error"] = str(e)
+print(json.dumps(timings))
+"""
+
+
+def profile_startup(top: int = 15) -> Dict:
+    """Profile a cold start of the tutor in a fresh interpreter.
+
+    Returns:
+        Dict with the time to import AI_tutor, to construct a tutor and to
+        first use each client and the embedding model (in seconds), and the
+        `top` slowest modules imported by `import AI_tutor` with their
+        cumulative import time
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _STARTUP_SCRIPT],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    )
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        imports.append({"module": module.strip(), "cumulative_s": int(cumulative) / 1e6,
+                        "top_level": not module[1:].startswith(" ")})
+    slowest = sorted((i for i in imports if i["top_level"]),
+                     key=lambda i: i["cumulative_s"], reverse=True)[:top]
+    return {
+        **json.loads(process.stdout.strip().splitlines()[-1]),
+        "slowest_imports": [{"module": i["module"], "cumulative_s": i["cumulative_s"]}
+                            for i in slowest]
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure per-session tutor startup cost.")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--startup", action="store_true",
+                        help="Profile a cold start (imports and first use) instead")
+    args = parser.parse_args()
+    report = profile_startup() if args.startup else measure_sessions(args.sessions)
+    print(json.dumps(report, indent=2))
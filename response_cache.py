@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from tokens import estimate_tokens
+
+CACHE_FILENAME = "response_cache.sqlite3"
+
+_caches: Dict[str, "SemanticResponseCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def load_response_cache(persist_directory: str, **kwargs) -> "SemanticResponseCache":
+    """Return the process-wide response cache stored in the given directory."""
+    path = os.path.abspath(os.path.join(persist_directory, CACHE_FILENAME))
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = SemanticResponseCache(path, **kwargs)
+        return _caches[path]
+
+
+class SemanticResponseCache:
+    """Cache of tutor answers keyed by language and query embedding.
+
+    A lookup returns the answer of the most similar cached question in the same
+    language when its cosine similarity reaches the threshold. Entries are
+    evicted least-recently-used beyond `max_entries` and expire after
+    `ttl_seconds`. Every entry is tied to the corpus version it was produced
+    with, and the whole cache is dropped as soon as a different version is
+    seen. Entries are mirrored to SQLite so they survive restarts.
+    """
+
+    def __init__(self, path: Optional[str] = None, similarity_threshold: float = 0.92,
+                 max_entries: int = 2000, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.corpus_version: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._matrices: Dict[str, tuple] = {}
+        self._next_id = 0
+        self._metrics = {"hits": 0, "misses": 0, "saved_latency_s": 0.0, "saved_tokens": 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("""CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY, language TEXT, corpus_version TEXT, query TEXT,
+                embedding BLOB, response TEXT, created_at REAL, latency_s REAL, tokens INTEGER
+            )""")
+            self._db.commit()
+            self._load()
+
+    def _load(self) -> None:
+        """Load non-expired entries from disk, oldest first."""
+        cutoff = time.time() - self.ttl_seconds
+        self._db.execute("DELETE FROM entries WHERE created_at < ?", (cutoff,))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT id, language, corpus_version, query, embedding, response, created_at, "
+            "latency_s, tokens FROM entries ORDER BY id"
+        ).fetchall()
+        for row in rows:
+            self._entries[row[0]] = {
+                "language": row[1], "corpus_version": row[2], "query": row[3],
+                "embedding": np.frombuffer(row[4], dtype=np.float32),
+                "response": row[5], "created_at": row[6],
+                "latency_s": row[7], "tokens": row[8]
+            }
+            self.corpus_version = row[2]
+        self._next_id = rows[-1][0] + 1 if rows else 0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, corpus_version: str) -> None:
+        """Drop every entry if the corpus changed since they were cached."""
+        if corpus_version != self.corpus_version:
+            if self._entries:
+                print("Corpus changed, clearing response cache")
+            self._entries.clear()
+            self._matrices.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+            self.corpus_version = corpus_version
+
+    def _delete(self, entry_ids: List[int]) -> None:
+        for entry_id in entry_ids:
+            entry = self._entries.pop(entry_id)
+            self._matrices.pop(entry["language"], None)
+        if self._db is not None and entry_ids:
+            self._db.executemany("DELETE FROM entries WHERE id = ?", [(i,) for i in entry_ids])
+            self._db.commit()
+
+    def _matrix(self, language: str) -> tuple:
+        """Stacked embeddings of the entries of a language, rebuilt after each change."""
+        if language not in self._matrices:
+            ids = [i for i, entry in self._entries.items() if entry["language"] == language]
+            vectors = (np.stack([self._entries[i]["embedding"] for i in ids])
+                       if ids else np.empty((0, 0), dtype=np.float32))
+            self._matrices[language] = (ids, vectors)
+        return self._matrices[language]
+
+    def lookup(self, language: str, embedding: Sequence[float],
+               corpus_version: str) -> Optional[str]:
+        """Return a cached answer for a similar question, or None."""
+        query = self._normalize(embedding)
+        with self._lock:
+            self._check_version(corpus_version)
+            ids, vectors = self._matrix(language)
+            if ids:
+                scores = vectors @ query
+                best = int(np.argmax(scores))
+                entry_id = ids[best]
+                entry = self._entries[entry_id]
+                if time.time() - entry["created_at"] > self.ttl_seconds:
+                    self._delete([entry_id])
+                elif scores[best] >= self.similarity_threshold:
+                    self._entries.move_to_end(entry_id)
+                    self._metrics["hits"] += 1
+                    self._metrics["saved_latency_s"] += entry["latency_s"]
+                    self._metrics["saved_tokens"] += entry["tokens"]
+                    return entry["response"]
+            self._metrics["misses"] += 1
+            return None
+
+    def store(self, language: str, query: str, embedding: Sequence[float], response: str,
+              corpus_version: str, latency_s: float, prompt: str = "") -> None:
+        """Cache the answer to a question.
+
+        Args:
+            language: Language of the answer
+            query: Student question, kept for inspection
+            embedding: Query embedding used for similarity lookups
+            response: Answer to cache
+            corpus_version: Version of the corpus the answer was built from
+            latency_s: Time it took to produce the answer, credited on each hit
+            prompt: Prompt sent to the LLM, used to estimate the tokens saved
+        """
+        vector = self._normalize(embedding)
+        tokens = estimate_tokens(prompt) + estimate_tokens(response)
+        now = time.time()
+        with self._lock:
+            self._check_version(corpus_version)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "language": language, "corpus_version": corpus_version, "query": query,
+                "embedding": vector, "response": response, "created_at": now,
+                "latency_s": latency_s, "tokens": tokens
+            }
+            self._matrices.pop(language, None)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (entry_id, language, corpus_version, query, vector.tobytes(),
+                     response, now, latency_s, tokens)
+                )
+                self._db.commit()
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._delete(list(self._entries)[:overflow])
+
+    def clear(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._delete(list(self._entries))
+
+    def metrics(self) -> Dict:
+        """Hit rate, saved latency and saved tokens since the process started."""
+        with self._lock:
+            lookups = self._metrics["hits"] + self._metrics["misses"]
+            return {
+                **self._metrics,
+                "hit_rate": self._metrics["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries)
+            }
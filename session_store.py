@@ -0,0 +1,96 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+# Messages kept per session; older turns only matter as summarized history
+MAX_MESSAGES = 200
+
+
+def open_session_store(location: str) -> "InMemorySessionStore":
+    """Session store for a location: "memory", or the path of a SQLite file."""
+    if location == "memory":
+        return InMemorySessionStore()
+    return SQLiteSessionStore(location)
+
+
+class InMemorySessionStore:
+    """Per-student conversation state kept in this process.
+
+    A session holds its language and its messages as dicts with `role` and
+    `content`, the shape EconomicsTutor takes as conversation history.
+    """
+
+    def __init__(self, max_messages: int = MAX_MESSAGES):
+        self.max_messages = max_messages
+        self._lock = threading.RLock()
+        self._sessions: Dict[str, Dict] = {}
+
+    def create(self, language: str = "fr") -> str:
+        """Start a session and return its ID."""
+        session_id = uuid.uuid4().hex
+        self._write(session_id, {"language": language, "messages": []})
+        return session_id
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """State of a session, or None if it does not exist."""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            return None if state is None else {"language": state["language"],
+                                               "messages": list(state["messages"])}
+
+    def _write(self, session_id: str, state: Dict) -> None:
+        with self._lock:
+            self._sessions[session_id] = state
+
+    def append(self, session_id: str, messages: List[Dict],
+               language: Optional[str] = None) -> None:
+        """Add messages to a session, creating it if needed."""
+        with self._lock:
+            state = self.get(session_id) or {"language": language or "fr", "messages": []}
+            if language is not None:
+                state["language"] = language
+            state["messages"] = (state["messages"] + list(messages))[-self.max_messages:]
+            self._write(session_id, state)
+
+    def reset(self, session_id: str) -> None:
+        """Clear the messages of a session, keeping its language."""
+        with self._lock:
+            state = self.get(session_id)
+            if state is not None:
+                self._write(session_id, {"language": state["language"], "messages": []})
+
+
+class SQLiteSessionStore(InMemorySessionStore):
+    """Session store persisted to SQLite, so sessions survive server restarts."""
+
+    def __init__(self, path: str, max_messages: int = MAX_MESSAGES):
+        super().__init__(max_messages)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY, language TEXT, messages TEXT, updated_at REAL
+        )""")
+        self._db.commit()
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT language, messages FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return None if row is None else {"language": row[0], "messages": json.loads(row[1])}
+
+    def _write(self, session_id: str, state: Dict) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                (session_id, state["language"],
+                 json.dumps(state["messages"], ensure_ascii=False), time.time())
+            )
+            self._db.commit()
@@ -0,0 +1,32 @@
+import json
+
+from batch_answer import answer_file, answered_ids
+
+
+class FlakyTutor:
+    """Answers every question but those listed in `failing`."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.asked = []
+
+    def answer_questions(self, questions, language="fr", max_concurrency=8):
+        self.asked.extend(questions)
+        return [{"answer": "Erreur", "error": "boom"} if question in self.failing
+                else {"answer": f"Réponse à {question}", "error": None} for question in questions]
+
+
+def test_failed_questions_are_retried_on_rerun(tmp_path):
+    questions, answers = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+    questions.write_text("\n".join(json.dumps({"id": i, "question": f"Q{i}"}) for i in range(5)))
+
+    stats = answer_file(FlakyTutor(failing={"Q1", "Q3"}), str(questions), str(answers))
+    assert (stats["answered"], stats["failed"]) == (3, 2)
+    failed = [row for row in map(json.loads, answers.read_text().splitlines()) if "error" in row]
+    assert [(row["id"], row["answer"]) for row in failed] == [(1, None), (3, None)]
+    assert answered_ids(str(answers)) == {"0", "2", "4"}
+
+    tutor = FlakyTutor()
+    answer_file(tutor, str(questions), str(answers))
+    assert tutor.asked == ["Q1", "Q3"]
+    assert answered_ids(str(answers)) == {"0", "1", "2", "3", "4"}
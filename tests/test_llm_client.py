@@ -0,0 +1,55 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from llm_client import LLMClient, RateLimiter
+
+TOKENS_PER_MINUTE = 60000
+
+
+class ServerError(Exception):
+    status_code = 500
+
+
+class ScriptedCompletions:
+    """Answers the n-th call after delays[n] seconds, failing the calls listed in `failing`."""
+
+    def __init__(self, delays, failing=()):
+        self.delays = delays
+        self.failing = set(failing)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self.lock:
+            call = self.calls
+            self.calls += 1
+        time.sleep(self.delays[call])
+        if call in self.failing:
+            raise ServerError("overloaded")
+        return SimpleNamespace(completion="Le PIB")
+
+
+def unused_tokens(limiter):
+    return TOKENS_PER_MINUTE - limiter._tokens
+
+
+def test_failed_attempts_give_back_their_completion_budget():
+    limiter = RateLimiter(tokens_per_minute=TOKENS_PER_MINUTE)
+    completions = ScriptedCompletions([0, 0], failing={0})
+    llm = LLMClient(client=SimpleNamespace(completions=completions), limiter=limiter,
+                    base_delay=0.01)
+    assert llm.complete("Qu'est-ce que le PIB ?", max_tokens=2000, temperature=0.5) == "Le PIB"
+    assert completions.calls == 2
+    assert unused_tokens(limiter) < 100
+
+
+def test_losing_hedge_gives_back_its_reservation():
+    limiter = RateLimiter(tokens_per_minute=TOKENS_PER_MINUTE)
+    completions = ScriptedCompletions([0.3, 0.6])
+    llm = LLMClient(client=SimpleNamespace(completions=completions), limiter=limiter,
+                    hedge_after=0.1)
+    llm.complete("Qu'est-ce que le PIB ?", max_tokens=2000, temperature=0.5)
+    time.sleep(0.6)
+    assert completions.calls == 2
+    assert unused_tokens(limiter) < 100
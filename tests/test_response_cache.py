@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from AI_tutor import EconomicsTutor
+from llm_client import LLMClient
+
+
+class CountingCompletions:
+    """Completions endpoint answering "answer#<n>" to the n-th call."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, model, prompt, max_tokens_to_sample, temperature, stream=False):
+        self.calls += 1
+        return SimpleNamespace(completion=f"answer#{self.calls}")
+
+
+def make_tutor(tmp_path):
+    completions = CountingCompletions()
+    tutor = EconomicsTutor(
+        persist_directory=str(tmp_path / "db"),
+        corpus_dir=str(tmp_path / "corpus"),
+        quiz_bank=False,
+        llm_client=LLMClient(client=SimpleNamespace(completions=completions)),
+        embedding_function=lambda texts: [[1.0, 0.0, 0.0] for _ in texts]
+    )
+    tutor.get_persistent_collection = lambda: SimpleNamespace(count=lambda: 1)
+    tutor._retrieve_context = lambda query, query_embedding, language: ("Le PIB ...", [])
+    return tutor, completions
+
+
+def test_same_question_without_history_is_cached(tmp_path):
+    tutor, completions = make_tutor(tmp_path)
+    first = tutor.handle_question("Et pourquoi ?")
+    second = tutor.handle_question("Et pourquoi ?")
+    assert first == second == "answer#1"
+    assert completions.calls == 1
+
+
+def test_different_histories_do_not_share_answers(tmp_path):
+    tutor, completions = make_tutor(tmp_path)
+    about_inflation = [{"role": "user", "content": "Qu'est-ce que l'inflation ?"},
+                       {"role": "assistant", "content": "La hausse générale des prix."}]
+    about_unemployment = [{"role": "user", "content": "Qu'est-ce que le chômage ?"},
+                          {"role": "assistant", "content": "Le manque d'emploi."}]
+    first = tutor.handle_question("Et pourquoi ?", conversation_history=about_inflation,
+                                  session_id="a")
+    second = tutor.handle_question("Et pourquoi ?", conversation_history=about_unemployment,
+                                   session_id="b")
+    # Answers given within a conversation are not stored for anyone else either
+    without_history = tutor.handle_question("Et pourquoi ?")
+    assert (first, second, without_history) == ("answer#1", "answer#2", "answer#3")
+    assert completions.calls == 3
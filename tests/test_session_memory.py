@@ -0,0 +1,51 @@
+from context_builder import SessionMemory, extractive_summary
+from session_store import MAX_MESSAGES
+
+
+def conversation(n_turns):
+    messages = []
+    for i in range(n_turns):
+        messages.append({"role": "user", "content": f"Question {i} : que devient le PIB quand "
+                                                      f"la banque centrale relève son taux ?"})
+        messages.append({"role": "assistant", "content": f"Réponse {i}. La demande ralentit, "
+                                                           f"l'investissement recule et le PIB aussi."})
+    return messages
+
+
+def counting_memory():
+    calls = []
+
+    def summarize(summary, turns, max_tokens):
+        calls.append(len(turns))
+        return extractive_summary(summary, turns, max_tokens)
+
+    return SessionMemory(max_tokens=200, summarize=summarize), calls
+
+
+def test_each_message_is_summarized_once():
+    memory, calls = counting_memory()
+    messages = conversation(150)
+    for end in range(2, len(messages) + 1, 2):
+        memory.sync(messages[:end])
+    assert sum(calls) <= len(messages)
+    assert memory.n_messages == len(messages)
+
+
+def test_memory_survives_the_session_store_cap():
+    memory, calls = counting_memory()
+    messages = conversation(150)
+    for end in range(2, len(messages) + 1, 2):
+        memory.sync(messages[:end][-MAX_MESSAGES:])
+    # The window slides once the store drops the oldest messages; nothing is folded twice
+    assert sum(calls) <= len(messages)
+    assert memory.n_messages == len(messages)
+    assert "Question 149" in memory.render()
+    assert "Q: Question" in memory.summary
+
+
+def test_cleared_conversation_starts_over():
+    memory, _ = counting_memory()
+    memory.sync(conversation(20))
+    memory.sync([{"role": "user", "content": "Parlons du chômage."}])
+    assert memory.summary == ""
+    assert [msg["content"] for msg in memory.turns] == ["Parlons du chômage."]
@@ -0,0 +1,9 @@
+import math
+
+# Average number of characters per token for Claude on French and English prose
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token count estimate, good enough for budgets and metrics."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
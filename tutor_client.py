@@ -0,0 +1,113 @@
+import codecs
+import json
+import os
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, Iterator, List, Optional
+
+
+class TutorClient:
+    """Client for tutor_server with the methods front_end2 calls on EconomicsTutor.
+
+    Conversation history lives on the server, keyed by `session_id`, so the
+    UI can restart without losing it; the conversation histories and session
+    IDs the tutor methods take are ignored for that reason.
+    """
+
+    def __init__(self, base_url: str, session_id: Optional[str] = None, timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        self.session_id = session_id
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, payload: Optional[Dict] = None,
+                 data: Optional[bytes] = None, content_type: str = "application/json"):
+        if payload is not None:
+            data = json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data, method=method,
+                                         headers={"Content-Type": content_type})
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise RuntimeError(f"Tutor server returned {e.code}: {message}") from None
+
+    def _json(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        with self._request(method, path, payload) as response:
+            return json.loads(response.read())
+
+    def ensure_session(self, language: str = "fr") -> str:
+        """Create a server-side session unless the client already has one."""
+        if self.session_id is None:
+            self.session_id = self._json("POST", "/sessions", {"language": language})["session_id"]
+        return self.session_id
+
+    def messages(self) -> List[Dict]:
+        """Conversation of the session as kept by the server."""
+        if self.session_id is None:
+            return []
+        try:
+            return self._json("GET", f"/sessions/{self.session_id}")["messages"]
+        except RuntimeError:
+            return []
+
+    def clear_history(self) -> None:
+        """Forget the conversation of the session."""
+        if self.session_id is not None:
+            self._json("DELETE", f"/sessions/{self.session_id}")
+
+    def handle_question(self, query: str, language: str = "fr",
+                        conversation_history: Optional[List[Dict]] = None,
+                        session_id: Optional[str] = None) -> str:
+        result = self._json("POST", "/ask", {"question": query, "language": language,
+                                             "session_id": self.ensure_session(language)})
+        return result["answer"]
+
+    def handle_question_stream(self, query: str, language: str = "fr",
+                               conversation_history: Optional[List[Dict]] = None,
+                               session_id: Optional[str] = None) -> Iterator[str]:
+        payload = {"question": query, "language": language,
+                   "session_id": self.ensure_session(language)}
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        with self._request("POST", "/stream", payload) as response:
+            while True:
+                data = response.read1(8192)
+                if not data:
+                    break
+                text = decoder.decode(data)
+                if text:
+                    yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    def generate_quiz(self, conversation_history: List[Dict], topic: str,
+                      difficulty: str = "intermediate", language: str = "fr",
+                      session_id: Optional[str] = None) -> str:
+        payload = {"topic": topic, "difficulty": difficulty, "language": language,
+                   "session_id": self.ensure_session(language)}
+        with self._request("POST", "/quiz", payload) as response:
+            return response.read().decode("utf-8")
+
+    def upload_document(self, filename: str, content: bytes) -> Dict:
+        """Send a PDF to the server, which saves it and queues it for indexing.
+
+        Returns the ingestion job; the same content always maps to the same job.
+        """
+        query = urllib.parse.urlencode({"filename": os.path.basename(filename)})
+        with self._request("POST", f"/ingest?{query}", data=content,
+                           content_type="application/pdf") as response:
+            return json.loads(response.read())
+
+    def job(self, job_id: str) -> Dict:
+        """Status, progress and throughput of an ingestion job."""
+        return self._json("GET", f"/jobs/{job_id}")
+
+    def cancel_job(self, job_id: str) -> Dict:
+        return self._json("DELETE", f"/jobs/{job_id}")
+
+    def initialize_corpus(self) -> Dict:
+        return self._json("POST", "/initialize", {})
@@ -0,0 +1,416 @@
+import argparse
+import json
+import os
+import re
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from ingestion_jobs import load_job_queue
+from session_store import open_session_store
+
+# Largest request body accepted, enough for a course PDF
+MAX_BODY_BYTES = 50 * 1024 * 1024
+
+# Requests refused while saturated are read up to this size before the 503, so clients see it
+REJECT_DRAIN_BYTES = 1024 * 1024
+# Refused requests read at once; beyond that the connection is just closed
+REJECT_WORKERS = 4
+
+
+class BusyRequestHandler(BaseHTTPRequestHandler):
+    """Answers any request with a 503 and a Retry-After header once it has been read."""
+
+    protocol_version = "HTTP/1.1"
+    # Seconds a refused client gets to send its request
+    timeout = 2
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reject(self) -> None:
+        try:
+            remaining = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            remaining = 0
+        if remaining <= REJECT_DRAIN_BYTES:
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, 64 * 1024))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+        body = b'{"error": "server busy"}'
+        self.send_response(503)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Retry-After", "1")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = True
+
+    do_GET = do_POST = do_DELETE = _reject
+
+
+class TutorHTTPServer(HTTPServer):
+    """HTTP server answering requests on a bounded worker pool.
+
+    Up to `workers` requests run at once and `queue_size` more wait for a
+    worker; anything beyond that is refused right away with a 503 and a
+    Retry-After header, so overload shows up as fast rejections instead of
+    ever-growing latency. Refused requests are read by a few BusyRequestHandler
+    threads before the 503 is sent, so clients still writing their request
+    get the response rather than a reset connection.
+    """
+
+    def __init__(self, address, tutor, sessions, workers: int = 64, queue_size: int = 256,
+                 ingest_workers: int = 1):
+        super().__init__(address, TutorRequestHandler)
+        self.tutor = tutor
+        self.sessions = sessions
+        self.workers = workers
+        self.ingest_lock = threading.Lock()
+        self.ingestion_jobs = load_job_queue(tutor, workers=ingest_workers)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tutor-http")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._reject_pool = ThreadPoolExecutor(max_workers=REJECT_WORKERS,
+                                               thread_name_prefix="tutor-http-busy")
+        self._reject_slots = threading.BoundedSemaphore(2 * REJECT_WORKERS)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Requests running or waiting for a worker."""
+        return self._in_flight
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            if self._reject_slots.acquire(blocking=False):
+                self._reject_pool.submit(self._reject, request, client_address)
+            else:
+                self.shutdown_request(request)
+            return
+        with self._in_flight_lock:
+            self._in_flight += 1
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._in_flight_lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def _reject(self, request, client_address):
+        try:
+            BusyRequestHandler(request, client_address, self)
+        except Exception:
+            pass
+        finally:
+            self.shutdown_request(request)
+            self._reject_slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+        self._reject_pool.shutdown(wait=False)
+
+
+class TutorRequestHandler(BaseHTTPRequestHandler):
+    """JSON endpoints around EconomicsTutor.
+
+    POST /sessions                  start a session
+    GET /sessions/<id>              language and messages of a session
+    DELETE /sessions/<id>           clear a session's messages
+    POST /ask                       {"question", "session_id"?, "language"?} -> {"answer"}
+    POST /stream                    same body; the answer streamed as chunked UTF-8 text
+    POST /quiz                      {"topic", "session_id"?, "difficulty"?, "language"?} -> quiz JSON
+    POST /ingest?filename=<name>    PDF bytes, saved to the corpus directory and queued -> job
+    GET /jobs                       ingestion jobs
+    GET /jobs/<id>                  status, progress and throughput of a job
+    DELETE /jobs/<id>               cancel a job
+    POST /initialize                re-sync the corpus directory
+    GET /health                     liveness and load
+    """
+
+    protocol_version = "HTTP/1.1"
+    server: TutorHTTPServer
+
+    def log_message(self, format, *args):
+        pass
+
+    # Responses
+
+    def _send_json(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = True
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send_json(status, {"error": message})
+
+    # Requests
+
+    def _read_body(self) -> Optional[bytes]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._send_error(413, "request body too large")
+            return None
+        return self.rfile.read(length)
+
+    def _read_json(self) -> Optional[Dict]:
+        body = self._read_body()
+        if body is None:
+            return None
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self._send_error(400, "invalid JSON body")
+            return None
+        if not isinstance(payload, dict):
+            self._send_error(400, "JSON body must be an object")
+            return None
+        return payload
+
+    def _session(self, payload: Dict) -> Dict:
+        """Session named in the payload, or a new one; unknown IDs start empty sessions."""
+        session_id = payload.get("session_id") or self.server.sessions.create(
+            payload.get("language", "fr")
+        )
+        state = self.server.sessions.get(session_id) or {"language": "fr", "messages": []}
+        return {"id": session_id, "language": payload.get("language", state["language"]),
+                "messages": state["messages"]}
+
+    def _dispatch(self, method: str) -> None:
+        path = urlparse(self.path).path.rstrip("/")
+        routes = {
+            ("GET", "/health"): self._health,
+            ("POST", "/sessions"): self._create_session,
+            ("POST", "/ask"): self._ask,
+            ("POST", "/stream"): self._stream,
+            ("POST", "/quiz"): self._quiz,
+            ("POST", "/ingest"): self._ingest,
+            ("GET", "/jobs"): self._jobs,
+            ("POST", "/initialize"): self._initialize
+        }
+        try:
+            handler = routes.get((method, path))
+            if handler is not None:
+                handler()
+                return
+            match = re.fullmatch(r"/sessions/([0-9a-f]+)", path)
+            if match and method in ("GET", "DELETE"):
+                self._session_state(match.group(1), reset=method == "DELETE")
+                return
+            match = re.fullmatch(r"/jobs/([0-9a-f]+)", path)
+            if match and method in ("GET", "DELETE"):
+                self._job(match.group(1), cancel=method == "DELETE")
+                return
+            self._send_error(404, f"no route for {method} {path}")
+        except Exception as e:
+            traceback.print_exc()
+            self._send_error(500, str(e))
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    # Endpoints
+
+    def _health(self) -> None:
+        self._send_json(200, {"status": "ok", "in_flight": self.server.in_flight,
+                              "workers": self.server.workers})
+
+    def _create_session(self) -> None:
+        payload = self._read_json()
+        if payload is None:
+            return
+        session_id = self.server.sessions.create(payload.get("language", "fr"))
+        self._send_json(201, {"session_id": session_id})
+
+    def _session_state(self, session_id: str, reset: bool) -> None:
+        if self.server.sessions.get(session_id) is None:
+            self._send_error(404, "unknown session")
+            return
+        if reset:
+            self.server.sessions.reset(session_id)
+        self._send_json(200, {"session_id": session_id, **self.server.sessions.get(session_id)})
+
+    def _ask(self) -> None:
+        payload = self._read_json()
+        if payload is None:
+            return
+        if not payload.get("question"):
+            self._send_error(400, "missing question")
+            return
+        session = self._session(payload)
+        answer = self.server.tutor.handle_question(payload["question"], session["language"],
+                                                   conversation_history=session["messages"],
+                                                   session_id=session["id"])
+        self.server.sessions.append(session["id"], [
+            {"role": "user", "content": payload["question"]},
+            {"role": "assistant", "content": answer}
+        ], language=session["language"])
+        self._send_json(200, {"session_id": session["id"], "answer": answer})
+
+    def _stream(self) -> None:
+        payload = self._read_json()
+        if payload is None:
+            return
+        if not payload.get("question"):
+            self._send_error(400, "missing question")
+            return
+        session = self._session(payload)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("X-Session-Id", session["id"])
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        parts = []
+        for delta in self.server.tutor.handle_question_stream(
+                payload["question"], session["language"],
+                conversation_history=session["messages"], session_id=session["id"]):
+            parts.append(delta)
+            data = delta.encode("utf-8")
+            if data:
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+        self.server.sessions.append(session["id"], [
+            {"role": "user", "content": payload["question"]},
+            {"role": "assistant", "content": "".join(parts)}
+        ], language=session["language"])
+
+    def _quiz(self) -> None:
+        payload = self._read_json()
+        if payload is None:
+            return
+        if not payload.get("topic"):
+            self._send_error(400, "missing topic")
+            return
+        session = self._session(payload)
+        quiz = self.server.tutor.generate_quiz(
+            session["messages"], payload["topic"],
+            difficulty=payload.get("difficulty", "intermediate"),
+            language=session["language"],
+            session_id=session["id"]
+        )
+        body = quiz.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Session-Id", session["id"])
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = True
+
+    def _ingest(self) -> None:
+        filename = os.path.basename(parse_qs(urlparse(self.path).query).get("filename", [""])[0])
+        if not filename.lower().endswith(".pdf"):
+            self._send_error(400, "filename must name a .pdf file")
+            return
+        body = self._read_body()
+        if body is None:
+            return
+        job = self.server.ingestion_jobs.submit(filename, body)
+        self._send_json(202, job.to_dict())
+
+    def _jobs(self) -> None:
+        self._send_json(200, {"jobs": [job.to_dict() for job in self.server.ingestion_jobs.jobs()]})
+
+    def _job(self, job_id: str, cancel: bool) -> None:
+        jobs = self.server.ingestion_jobs
+        job = jobs.cancel(job_id) if cancel else jobs.get(job_id)
+        if job is None:
+            self._send_error(404, "unknown job")
+            return
+        self._send_json(200, job.to_dict())
+
+    def _initialize(self) -> None:
+        with self.server.ingest_lock:
+            self.server.tutor.initialize_corpus()
+        stats = self.server.tutor.last_ingestion_stats or {}
+        self._send_json(200, {"status": "ok", "stats": {k: v for k, v in stats.items()
+                                                        if k != "chunks_by_file"}})
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, workers: int = 64,
+          queue_size: int = 256, session_store: str = "memory", tutor=None,
+          ingest_workers: int = 1, **tutor_options) -> None:
+    """Run the tutor HTTP service until interrupted.
+    
+    Without a tutor, one is created with `tutor_options` as keyword arguments.
+    """
+    if tutor is None:
+        from AI_tutor import EconomicsTutor
+
+        tutor = EconomicsTutor(**tutor_options)
+        tutor.initialize_corpus()
+    tutor.prefill_quiz_bank()
+    server = TutorHTTPServer((host, port), tutor, open_session_store(session_store),
+                             workers=workers, queue_size=queue_size,
+                             ingest_workers=ingest_workers)
+    print(f"Serving the tutor on http://{host}:{port} with {workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if tutor.quiz_bank is not None:
+            tutor.quiz_bank.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve EconomicsTutor over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=64, help="Requests handled at once")
+    parser.add_argument("--queue-size", type=int, default=256,
+                        help="Requests waiting for a worker before new ones get a 503")
+    parser.add_argument("--session-store", default=os.path.join("chromadb_data", "sessions.sqlite3"),
+                        help='"memory", or a SQLite file so sessions survive restarts')
+    parser.add_argument("--ingest-workers", type=int, default=1,
+                        help="Threads indexing uploaded PDFs in the background")
+    parser.add_argument("--requests-per-minute", type=int, default=None,
+                        help="LLM requests per minute allowed by the API plan")
+    parser.add_argument("--tokens-per-minute", type=int, default=None,
+                        help="LLM tokens per minute allowed by the API plan")
+    parser.add_argument("--hedge-after", type=float, default=None,
+                        help="Seconds after which a slow chat completion is sent again")
+    parser.add_argument("--hedge-workers", type=int, default=16,
+                        help="Hedged completions in flight at once; slow calls beyond that are not hedged")
+    parser.add_argument("--embedding-model", default=None,
+                        help="Sentence-transformers model embedding chunks and questions, e.g. "
+                             "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.queue_size, args.session_store,
+          ingest_workers=args.ingest_workers, requests_per_minute=args.requests_per_minute,
+          tokens_per_minute=args.tokens_per_minute, hedge_after=args.hedge_after,
+          hedge_workers=args.hedge_workers, embedding_model=args.embedding_model)
+
+
+if __name__ == "__main__":
+    main()
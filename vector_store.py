@@ -0,0 +1,238 @@
+import glob
+import json
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+STORE_DIRNAME = "quantized"
+QUANTIZATIONS = ("int8", "float16")
+# Rows scored per block, bounding the temporary float32 copy of quantized rows
+SCAN_BLOCK_ROWS = 65536
+
+_stores: Dict[str, "QuantizedVectorStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def store_path(persist_directory: str, collection_name: str,
+               corpus_version: str, quantization: str) -> str:
+    """Directory of a collection's export for one corpus version and quantization."""
+    return os.path.abspath(os.path.join(
+        persist_directory, STORE_DIRNAME, f"{collection_name}-{corpus_version}-{quantization}"
+    ))
+
+
+def get_quantized_store(collection, persist_directory: str, collection_name: str,
+                        corpus_version: str, quantization: str = "int8") -> "QuantizedVectorStore":
+    """Return the process-wide quantized store of a collection at a corpus version.
+
+    The store is opened from disk when some process already exported this
+    version, and exported from the collection otherwise. Exports of other
+    versions are removed once the new one is in place.
+    """
+    path = store_path(persist_directory, collection_name, corpus_version, quantization)
+    with _stores_lock:
+        if path not in _stores:
+            if not os.path.exists(os.path.join(path, "meta.json")):
+                export_collection(collection, path, quantization)
+                prefix = os.path.join(os.path.dirname(path), f"{collection_name}-")
+                for old_path in glob.glob(f"{prefix}*-{quantization}"):
+                    if old_path != path:
+                        _stores.pop(old_path, None)
+                        shutil.rmtree(old_path, ignore_errors=True)
+            _stores[path] = QuantizedVectorStore(path)
+        return _stores[path]
+
+
+def _quantize(vectors: np.ndarray, quantization: str):
+    """Quantized rows and the per-row scale that maps them back to floats."""
+    if quantization == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.ones(0)
+    scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def export_collection(collection, path: str, quantization: str = "int8",
+                      batch_size: int = 1000) -> None:
+    """Write every chunk of a Chroma collection to a quantized store directory.
+
+    The store is written to a temporary directory and renamed into place, so
+    readers never see a partial export.
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+
+    ids: List[str] = []
+    documents: List[str] = []
+    metadatas: List[Dict] = []
+    vectors: List[np.ndarray] = []
+    offset = 0
+    while True:
+        batch = collection.get(include=["embeddings", "documents", "metadatas"],
+                               limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            break
+        ids.extend(batch["ids"])
+        documents.extend(batch["documents"])
+        metadatas.extend(m or {} for m in batch["metadatas"])
+        vectors.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        offset += len(batch["ids"])
+    exact = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    codes, scales = _quantize(exact, quantization)
+
+    # Text column: one UTF-8 blob plus row offsets
+    encoded = [document.encode("utf-8") for document in documents]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+
+    # Metadata columns: distinct values per key plus a row-by-key matrix of codes
+    keys = sorted({key for metadata in metadatas for key in metadata})
+    values: Dict[str, List] = {key: [] for key in keys}
+    lookup: Dict[str, Dict] = {key: {} for key in keys}
+    meta_codes = np.full((len(metadatas), len(keys)), -1, dtype=np.int32)
+    for row, metadata in enumerate(metadatas):
+        for col, key in enumerate(keys):
+            if key in metadata:
+                value = metadata[key]
+                if value not in lookup[key]:
+                    lookup[key][value] = len(values[key])
+                    values[key].append(value)
+                meta_codes[row, col] = lookup[key][value]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "codes.npy"), codes)
+    np.save(os.path.join(tmp_path, "scales.npy"), scales)
+    np.save(os.path.join(tmp_path, "vectors.npy"), exact)
+    np.save(os.path.join(tmp_path, "norms.npy"), np.einsum("ij,ij->i", exact, exact))
+    np.save(os.path.join(tmp_path, "text_offsets.npy"), offsets)
+    np.save(os.path.join(tmp_path, "metadata_codes.npy"), meta_codes)
+    with open(os.path.join(tmp_path, "text.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    with open(os.path.join(tmp_path, "columns.json"), "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "keys": keys, "values": values}, f, ensure_ascii=False)
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"count": len(ids), "dimensions": int(exact.shape[1]) if len(ids) else 0,
+                   "quantization": quantization}, f)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another process exported the same version first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    print(f"Exported {len(ids)} vectors to {quantization} store {path}")
+
+
+class QuantizedVectorStore:
+    """Read-only, memory-mapped copy of a collection for dense search.
+
+    Vectors are kept int8- or float16-quantized for a vectorized first pass
+    over every row, and the best `rerank_factor * n_results` candidates are
+    rescored exactly against float32 vectors. Vector and text files are
+    memory-mapped, so processes opening the same store share them through
+    the page cache. `query` and `count` mirror the Chroma collection API.
+    """
+
+    def __init__(self, path: str, rerank_factor: int = 4):
+        self.path = path
+        self.rerank_factor = rerank_factor
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(path, "columns.json"), "r", encoding="utf-8") as f:
+            columns = json.load(f)
+        self.quantization = meta["quantization"]
+        self.ids: List[str] = columns["ids"]
+        self.keys: List[str] = columns["keys"]
+        self.values: Dict[str, List] = columns["values"]
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        self.codes = load("codes.npy")
+        self.scales = np.asarray(load("scales.npy"))
+        self.vectors = load("vectors.npy")
+        self.norms = np.asarray(load("norms.npy"))
+        self.text_offsets = load("text_offsets.npy")
+        self.metadata_codes = np.asarray(load("metadata_codes.npy"))
+        self.text = (np.memmap(os.path.join(path, "text.bin"), dtype=np.uint8, mode="r")
+                     if self.text_offsets[-1] > 0 else np.zeros(0, dtype=np.uint8))
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _document(self, row: int) -> str:
+        start, end = self.text_offsets[row], self.text_offsets[row + 1]
+        return self.text[start:end].tobytes().decode("utf-8")
+
+    def _metadata(self, row: int) -> Dict:
+        return {key: self.values[key][code]
+                for key, code in zip(self.keys, self.metadata_codes[row]) if code >= 0}
+
+    def _mask(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """Rows matching a Chroma-style filter of `key: value`, `$eq`, `$in` and `$and` clauses."""
+        if not where:
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._mask(clause)
+                continue
+            if isinstance(condition, dict):
+                (operator, operand), = condition.items()
+                if operator not in ("$eq", "$in"):
+                    raise ValueError(f"Unsupported filter operator {operator!r}")
+                allowed = operand if operator == "$in" else [operand]
+            else:
+                allowed = [condition]
+            if key not in self.keys:
+                mask[:] = False
+                continue
+            codes = [i for i, value in enumerate(self.values[key]) if value in allowed]
+            mask &= np.isin(self.metadata_codes[:, self.keys.index(key)], codes)
+        return mask
+
+    def _approximate_distances(self, queries: np.ndarray) -> np.ndarray:
+        """Squared L2 distances up to a per-query constant, from the quantized rows."""
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), SCAN_BLOCK_ROWS):
+            block = np.asarray(self.codes[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            scores[:, start:start + len(block)] = (queries @ block.T) * self.scales[start:start + len(block)]
+        return self.norms[None, :] - 2 * scores
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10,
+              where: Optional[Dict] = None) -> Dict:
+        """Return the nearest chunks of each query in the shape of a Chroma query result."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        mask = self._mask(where)
+        if not self.ids:
+            approximate = np.zeros((len(queries), 0), dtype=np.float32)
+        else:
+            approximate = self._approximate_distances(queries)
+            if mask is not None:
+                approximate[:, ~mask] = np.inf
+        n_matching = len(self.ids) if mask is None else int(mask.sum())
+        n_candidates = min(n_results * self.rerank_factor, n_matching)
+
+        for query, row_scores in zip(queries, approximate):
+            if n_candidates == 0:
+                rows, distances = [], []
+            else:
+                candidates = np.argpartition(row_scores, n_candidates - 1)[:n_candidates]
+                candidates.sort()
+                exact = np.asarray(self.vectors[candidates]) - query
+                exact_distances = np.einsum("ij,ij->i", exact, exact)
+                order = np.argsort(exact_distances, kind="stable")[:n_results]
+                rows = candidates[order].tolist()
+                distances = exact_distances[order].tolist()
+            results["ids"].append([self.ids[row] for row in rows])
+            results["documents"].append([self._document(row) for row in rows])
+            results["metadatas"].append([self._metadata(row) for row in rows])
+            results["distances"].append(distances)
+        return results